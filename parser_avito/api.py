@@ -2,19 +2,31 @@
 FastAPI приложение для парсера Авито
 
 Предоставляет REST API для парсинга объявлений с Авито с аутентификацией по токену.
-Эндпоинт /parse принимает параметры поиска и возвращает найденные объявления.
+Эндпоинт /parse принимает параметры поиска и возвращает найденные объявления,
+/parse/batch - много независимых поисков за один запрос с потоковым ответом.
+С курсором (последнее просмотренное объявление) возвращаются только более новые.
+Страницы каталога кэшируются на PARSE_CACHE_TTL секунд (/cache - статистика и сброс).
+С pages > 1 страницы поиска загружаются параллельно и склеиваются по дате.
 """
 
+import asyncio
+import json
 import os
-from typing import List, Optional
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, List, Optional, Tuple
 from fastapi import FastAPI, HTTPException, Depends, status
+from fastapi.responses import StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from pydantic import BaseModel, HttpUrl
+from pydantic import BaseModel, Field, HttpUrl
 from loguru import logger
 
 from src.parser_cls import AvitoParse
+from src.cookie_store import CookieService, CookieStore
 from src.dto import AvitoConfig
-from src.models import ItemsResponse
+from src.page_cache import PageCache
+from src.parser_pool import ParserPool
+from src.models import CatalogCursor, CatalogResponse, catalog_is_exhausted, merge_catalogs
 
 
 # Загрузка переменных окружения
@@ -33,14 +45,71 @@ security = HTTPBearer()
 # Токен из переменных окружения
 API_TOKEN = os.getenv("API_TOKEN")
 
+# Количество одновременных парсингов (потоков с блокирующими запросами к Авито)
+PARSER_WORKERS = int(os.getenv("PARSER_WORKERS", "4"))
+
+# Период планового обновления cookies фоновым браузером, секунды
+COOKIES_REFRESH_INTERVAL = int(os.getenv("COOKIES_REFRESH_INTERVAL", "1800"))
+
+# Сколько секунд страница каталога живёт в кэше (0 - без кэша) и сколько страниц хранить
+PARSE_CACHE_TTL = float(os.getenv("PARSE_CACHE_TTL", "30"))
+PARSE_CACHE_MAX_ENTRIES = int(os.getenv("PARSE_CACHE_MAX_ENTRIES", "1000"))
+
+# Сколько страниц поиска можно запросить за один раз (параметр pages)
+PARSE_MAX_PAGES = int(os.getenv("PARSE_MAX_PAGES", "5"))
+
 logger.add("logs/api.log", rotation="5 MB", retention="5 days", level="INFO")
 
+# Пул потоков для синхронного парсера, чтобы не блокировать event loop
+parse_executor = ThreadPoolExecutor(max_workers=PARSER_WORKERS, thread_name_prefix="avito-parse")
+
+# Потоки для дополнительных страниц поиска: их загружают свободные парсеры пула
+page_executor = ThreadPoolExecutor(max_workers=PARSER_WORKERS, thread_name_prefix="avito-page")
+
+# Пул прогретых парсеров, создаётся при старте приложения
+parser_pool: Optional[ParserPool] = None
+
+# Кэш страниц каталога: одинаковые поиски в пределах TTL не ходят на Авито повторно
+page_cache = PageCache(ttl=PARSE_CACHE_TTL, max_entries=PARSE_CACHE_MAX_ENTRIES)
+
+
+class AdCursor(BaseModel):
+    """Курсор поиска: самое новое из уже просмотренных объявлений"""
+    timestamp: int  # sortTimeStamp объявления
+    ad_id: int  # ID объявления (различает объявления с одинаковым временем)
+
+    @classmethod
+    def from_key(cls, key: Optional[CatalogCursor]) -> Optional["AdCursor"]:
+        return cls(timestamp=key[0], ad_id=key[1]) if key else None
+
+    def to_key(self) -> CatalogCursor:
+        return self.timestamp, self.ad_id
+
 
 class ParseRequest(BaseModel):
     """Модель запроса для парсинга"""
     urls: List[HttpUrl]  # Обязательный параметр - список URL для парсинга
     min_price: Optional[int] = None  # Минимальная цена (необязательный)
     max_price: Optional[int] = None  # Максимальная цена (необязательный)  
+    cursor: Optional[AdCursor] = None  # Вернуть только объявления новее курсора (необязательный)
+    pages: int = Field(default=1, ge=1)  # Сколько страниц поиска просмотреть (не больше PARSE_MAX_PAGES)
+    max_age: Optional[int] = None  # Отбросить объявления старше стольких секунд (необязательный)
+
+
+class BatchSearch(BaseModel):
+    """Один поиск в пакетном запросе"""
+    id: str  # Идентификатор поиска, возвращается в результате
+    url: HttpUrl
+    min_price: Optional[int] = None
+    max_price: Optional[int] = None
+    cursor: Optional[AdCursor] = None
+    pages: int = Field(default=1, ge=1)
+    max_age: Optional[int] = None
+
+
+class BatchParseRequest(BaseModel):
+    """Модель пакетного запроса: независимые поиски со своими границами цены"""
+    searches: List[BatchSearch]
 
 
 class AdResult(BaseModel):
@@ -55,6 +124,17 @@ class ParseResponse(BaseModel):
     message: str  # Сообщение о результате
     ads: List[AdResult]  # Найденные объявления
     total_found: int  # Общее количество найденных объявлений
+    cursor: Optional[AdCursor] = None  # Курсор для следующего запроса
+
+
+class BatchSearchResult(BaseModel):
+    """Результат одного поиска пакетного запроса (одна строка NDJSON)"""
+    id: str
+    success: bool
+    message: str
+    ads: List[AdResult]
+    total_found: int
+    cursor: Optional[AdCursor] = None
 
 
 async def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
@@ -74,6 +154,209 @@ async def root():
     return {"message": "Авито Парсер API работает", "status": "ok"}
 
 
+def load_base_config() -> AvitoConfig:
+    """Базовая конфигурация парсера для API (прокси и настройки из .env)"""
+    # Загружаем список ссылок для смены IP из переменной окружения
+    # Формат: "url1|url2|url3"
+    proxy_change_urls_str = os.getenv("PROXY_CHANGE_URLS", "")
+    proxy_change_urls = []
+    if proxy_change_urls_str:
+        proxy_change_urls = [url.strip() for url in proxy_change_urls_str.split("|") if url.strip()]
+    
+    return AvitoConfig(
+        urls=[],
+        min_price=0,
+        max_price=999999999,
+        geo="",
+        count=1,  # Одна страница за запрос
+        one_time_start=True,  # Однократный запуск без циклов
+        pause_general=0,  # Убираем общую паузу
+        pause_between_links=0,  # Убираем паузу между ссылками
+        max_count_of_retry=3,
+        keys_word_white_list=[],
+        keys_word_black_list=[],
+        seller_black_list=[],
+        ignore_reserv=False,
+        ignore_promotion=False,
+        one_file_for_link=False,
+        parse_views=False,
+        max_age=0,  # Без ограничения по возрасту
+        proxy_string=os.getenv("PROXY_STRING"),  # Загружаем прокси из .env
+        # Несколько прокси для менеджера прокси. Формат: "proxy1|proxy2|proxy3"
+        proxy_strings=[proxy.strip() for proxy in os.getenv("PROXY_STRINGS", "").split("|") if proxy.strip()],
+        proxy_change_url=os.getenv("PROXY_CHANGE_URL"),  # Загружаем URL смены IP из .env (fallback)
+        proxy_change_urls=proxy_change_urls,  # Загружаем список ссылок для смены IP из .env
+    )
+
+
+def parse_urls(request: ParseRequest) -> Tuple[List[AdResult], Optional[AdCursor]]:
+    """
+    Синхронный парсинг списка URL
+
+    Использует блокирующий HTTP-клиент и time.sleep внутри AvitoParse,
+    поэтому вызывается только из пула потоков, а не из event loop.
+    Парсер берётся из пула: сессия, cookies и прокси у него уже прогреты.
+    """
+    return run_parse(
+        [str(url) for url in request.urls], request.min_price, request.max_price,
+        request.cursor, request.pages, request.max_age,
+    )
+
+
+def run_parse(
+        urls: List[str],
+        min_price: Optional[int],
+        max_price: Optional[int],
+        cursor: Optional[AdCursor] = None,
+        pages: int = 1,
+        max_age: Optional[int] = None,
+) -> Tuple[List[AdResult], Optional[AdCursor]]:
+    """Парсинг URL свободным парсером из пула (вызывается только из пула потоков)"""
+    with parser_pool.checkout(
+        urls=urls,
+        min_price=min_price or 0,
+        max_price=max_price or 999999999,
+        max_age=max_age or 0,
+    ) as parser:
+        return _parse_with(parser, cursor.to_key() if cursor else None, pages=min(pages, PARSE_MAX_PAGES))
+
+
+def parse_search(search: BatchSearch) -> BatchSearchResult:
+    """Один поиск пакетного запроса; ошибка поиска не прерывает остальные"""
+    try:
+        found_ads, cursor = run_parse(
+            [str(search.url)], search.min_price, search.max_price, search.cursor, search.pages, search.max_age
+        )
+        return BatchSearchResult(
+            id=search.id,
+            success=True,
+            message=f"Успешно найдено {len(found_ads)} объявлений",
+            ads=found_ads,
+            total_found=len(found_ads),
+            cursor=cursor,
+        )
+    except Exception as e:
+        logger.error(f"Ошибка при парсинге поиска {search.id}: {e}")
+        return BatchSearchResult(
+            id=search.id, success=False, message=str(e), ads=[], total_found=0, cursor=search.cursor
+        )
+
+
+def _parse_with(
+        parser: AvitoParse,
+        after: Optional[CatalogCursor] = None,
+        pages: int = 1,
+) -> Tuple[List[AdResult], Optional[AdCursor]]:
+    """
+    Парсинг URL из конфигурации парсера
+
+    С курсором after возвращает только объявления новее него. Новый курсор -
+    самое новое объявление страницы до фильтров, чтобы отсеянные фильтрами
+    объявления не разбирались повторно.
+    """
+    config = parser.config
+    
+    # Выполняем парсинг
+    found_ads = []
+    cursor = after
+    
+    for url in config.urls:
+        # Одновременные запросы той же ссылки ждут одну загрузку, свежая страница берётся из кэша
+        if pages > 1:
+            catalog = _load_pages(parser, url, pages, after)
+        else:
+            catalog = _load_page(parser, url)
+        if catalog is None:
+            continue
+            
+        try:
+            # Валидируем только нужные поля объявлений, а не всю модель Item
+            ads_models = CatalogResponse.from_catalog(catalog, after=after)
+        except Exception as err:
+            logger.error(f"Ошибка валидации объявлений: {err}")
+            continue
+        if ads_models.cursor:
+            cursor = max(cursor, ads_models.cursor) if cursor else ads_models.cursor
+            
+        # Очищаем и фильтруем объявления
+        ads = parser._clean_null_ads(ads=ads_models.items)
+        ads = parser._add_seller_to_ads(ads=ads)
+        
+        # Применяем фильтры
+        filtered_ads = parser.filter_ads(ads=ads)
+        
+        # Добавляем в результат только ID и цену
+        for ad in filtered_ads:
+            if ad.id and ad.priceDetailed and ad.priceDetailed.value:
+                found_ads.append(AdResult(
+                    id=ad.id if isinstance(ad.id, int) else ad.id.get('value', 0) if isinstance(ad.id, dict) else 0,
+                    price=ad.priceDetailed.value
+                ))
+
+    return found_ads, AdCursor.from_key(cursor)
+
+
+def _load_page(parser: AvitoParse, url: str) -> Optional[dict]:
+    """Каталог страницы из кэша или с Авито"""
+    return page_cache.get_or_load(url, lambda: _load_catalog(parser, url))
+
+
+def _load_pages(parser: AvitoParse, url: str, pages: int, after: Optional[CatalogCursor]) -> Optional[dict]:
+    """
+    Загружает страницы 1..pages поиска и склеивает их по дате
+
+    Страницы загружаются волнами: первую - сам парсер запроса, остальные -
+    свободные сейчас парсеры пула, каждый через свой прокси. После каждой волны
+    листание останавливается на первой странице, где нет объявлений новее
+    курсора и max_age, а также на пустой или не загрузившейся странице.
+    """
+    page_urls = [url]
+    while len(page_urls) < pages:
+        page_urls.append(parser.get_next_page_url(page_urls[-1]))
+    max_age = parser.config.max_age
+    min_timestamp = int((time.time() - max_age) * 1000) if max_age else None
+
+    catalogs = []
+    with parser_pool.borrow_idle(pages - 1) as helpers:
+        width = len(helpers) + 1
+        for start in range(0, pages, width):
+            wave = page_urls[start:start + width]
+            futures = [
+                page_executor.submit(_load_page, helper, page_url)
+                for helper, page_url in zip(helpers, wave[1:])
+            ]
+            results = [_load_page(parser, wave[0])] + [future.result() for future in futures]
+            for catalog in results:
+                if catalog is None:
+                    return merge_catalogs(catalogs) if catalogs else None
+                catalogs.append(catalog)
+                if catalog_is_exhausted(catalog, after, min_timestamp):
+                    logger.info(f"Листание остановлено на странице {len(catalogs)}: новых объявлений дальше нет")
+                    return merge_catalogs(catalogs)
+    return merge_catalogs(catalogs)
+
+
+def _load_catalog(parser: AvitoParse, url: str) -> Optional[dict]:
+    """Загружает страницу и достаёт из неё каталог (None, если не удалось)"""
+    logger.info(f"Парсинг URL: {url}")
+    
+    # Получаем HTML страницы
+    html_code = parser.fetch_data(url=url, retries=parser.config.max_count_of_retry)
+    
+    if not html_code:
+        logger.warning(f"Не удалось получить данные для URL: {url}")
+        return None
+        
+    # Извлекаем данные со страницы
+    data_from_page = parser.find_json_on_page(html_code=html_code)
+    
+    if not data_from_page:
+        logger.warning(f"Не найдены данные объявлений на странице: {url}")
+        return None
+    
+    return data_from_page.get("data", {}).get("catalog") or {}
+
+
 @app.post("/parse", response_model=ParseResponse)
 async def parse_avito(
     request: ParseRequest,
@@ -84,9 +367,11 @@ async def parse_avito(
     
     Принимает параметры поиска и возвращает найденные объявления с ID и ценой.
     Требует аутентификации по токену в заголовке Authorization: Bearer <token>
+    Сам парсинг выполняется в ограниченном пуле потоков, поэтому медленная
+    страница Авито не блокирует event loop и остальные запросы (в т.ч. /health).
     
     Args:
-        request: Параметры запроса (urls, min_price, max_price)
+        request: Параметры запроса (urls, min_price, max_price, cursor)
         token: Токен аутентификации (автоматически извлекается из заголовка)
         
     Returns:
@@ -98,83 +383,8 @@ async def parse_avito(
     try:
         logger.info(f"Начат парсинг для {len(request.urls)} URL(s)")
         
-        # Загружаем список ссылок для смены IP из переменной окружения
-        # Формат: "url1|url2|url3"
-        proxy_change_urls_str = os.getenv("PROXY_CHANGE_URLS", "")
-        proxy_change_urls = []
-        if proxy_change_urls_str:
-            proxy_change_urls = [url.strip() for url in proxy_change_urls_str.split("|") if url.strip()]
-        
-        # Создаем конфигурацию для парсера
-        config = AvitoConfig(
-            urls=[str(url) for url in request.urls],
-            min_price=request.min_price or 0,
-            max_price=request.max_price or 999999999,
-            geo="",
-            count=1,  # Одна страница за запрос
-            one_time_start=True,  # Однократный запуск без циклов
-            pause_general=0,  # Убираем общую паузу
-            pause_between_links=0,  # Убираем паузу между ссылками
-            max_count_of_retry=3,
-            keys_word_white_list=[],
-            keys_word_black_list=[],
-            seller_black_list=[],
-            ignore_reserv=False,
-            ignore_promotion=False,
-            one_file_for_link=False,
-            parse_views=False,
-            max_age=0,  # Без ограничения по возрасту
-            proxy_string=os.getenv("PROXY_STRING"),  # Загружаем прокси из .env
-            proxy_change_url=os.getenv("PROXY_CHANGE_URL"),  # Загружаем URL смены IP из .env (fallback)
-            proxy_change_urls=proxy_change_urls,  # Загружаем список ссылок для смены IP из .env
-        )
-        
-        # Создаем экземпляр парсера (без БД/антидубликатов)
-        parser = AvitoParse(config=config)
-        
-        # Выполняем парсинг
-        found_ads = []
-        
-        # Модифицированная логика парсинга для API
-        parser.load_cookies()
-        
-        for url in config.urls:
-            logger.info(f"Парсинг URL: {url}")
-            
-            # Получаем HTML страницы
-            html_code = parser.fetch_data(url=url, retries=config.max_count_of_retry)
-            
-            if not html_code:
-                logger.warning(f"Не удалось получить данные для URL: {url}")
-                continue
-                
-            # Извлекаем данные со страницы
-            data_from_page = parser.find_json_on_page(html_code=html_code)
-            
-            if not data_from_page:
-                logger.warning(f"Не найдены данные объявлений на странице: {url}")
-                continue
-                
-            try:
-                ads_models = ItemsResponse(**data_from_page.get("data", {}).get("catalog", {}))
-            except Exception as err:
-                logger.error(f"Ошибка валидации объявлений: {err}")
-                continue
-                
-            # Очищаем и фильтруем объявления
-            ads = parser._clean_null_ads(ads=ads_models.items)
-            ads = parser._add_seller_to_ads(ads=ads)
-            
-            # Применяем фильтры
-            filtered_ads = parser.filter_ads(ads=ads)
-            
-            # Добавляем в результат только ID и цену
-            for ad in filtered_ads:
-                if ad.id and ad.priceDetailed and ad.priceDetailed.value:
-                    found_ads.append(AdResult(
-                        id=ad.id if isinstance(ad.id, int) else ad.id.get('value', 0) if isinstance(ad.id, dict) else 0,
-                        price=ad.priceDetailed.value
-                    ))
+        loop = asyncio.get_running_loop()
+        found_ads, cursor = await loop.run_in_executor(parse_executor, parse_urls, request)
         
         logger.info(f"Найдено {len(found_ads)} объявлений")
         
@@ -182,7 +392,8 @@ async def parse_avito(
             success=True,
             message=f"Успешно найдено {len(found_ads)} объявлений",
             ads=found_ads,
-            total_found=len(found_ads)
+            total_found=len(found_ads),
+            cursor=cursor
         )
         
     except Exception as e:
@@ -193,10 +404,82 @@ async def parse_avito(
         )
 
 
+@app.post("/parse/batch")
+async def parse_avito_batch(
+    request: BatchParseRequest,
+    token: str = Depends(verify_token)
+):
+    """
+    Пакетный парсинг независимых поисков
+    
+    Поиски выполняются параллельно в пуле потоков парсинга (каждый берёт
+    свободный парсер и самый здоровый прокси), а результаты отдаются потоком
+    NDJSON по мере готовности: одна строка BatchSearchResult на поиск.
+    Позволяет клиенту обойтись одним HTTP-запросом на цикл отслеживания.
+    """
+    logger.info(f"Начат пакетный парсинг: {len(request.searches)} поисков")
+    loop = asyncio.get_running_loop()
+    futures = [loop.run_in_executor(parse_executor, parse_search, search) for search in request.searches]
+
+    async def stream_results() -> AsyncIterator[bytes]:
+        try:
+            for future in asyncio.as_completed(futures):
+                result = await future
+                yield (json.dumps(result.model_dump(), ensure_ascii=False) + "\n").encode()
+        finally:
+            # Клиент отключился - не начатые поиски не запускаем
+            for future in futures:
+                future.cancel()
+
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
+
+
+@app.get("/cache")
+async def cache_stats(token: str = Depends(verify_token)):
+    """Статистика кэша страниц каталога"""
+    return page_cache.stats()
+
+
+@app.delete("/cache")
+async def cache_evict(url: Optional[str] = None, token: str = Depends(verify_token)):
+    """Сбрасывает кэш страниц: одну ссылку (?url=...) или целиком"""
+    return {"evicted": page_cache.evict(url)}
+
+
+@app.on_event("startup")
+async def create_parser_pool():
+    """Создаёт пул долгоживущих парсеров (по одному на поток)"""
+    global parser_pool
+    cookie_service = CookieService(
+        store=CookieStore(),  # В API cookies живут в памяти процесса
+        proxy=AvitoParse.proxy_for_cookies(base_config := load_base_config()),
+        refresh_interval=COOKIES_REFRESH_INTERVAL,
+    )
+    parser_pool = ParserPool(base_config=base_config, size=PARSER_WORKERS, cookie_service=cookie_service)
+    # Браузер прогревается и обновляет cookies в фоне, запросы его не ждут
+    cookie_service.start()
+
+
+@app.on_event("shutdown")
+async def shutdown_executor():
+    """Останавливает пул потоков парсинга"""
+    parse_executor.shutdown(wait=False, cancel_futures=True)
+    page_executor.shutdown(wait=False, cancel_futures=True)
+    if parser_pool:
+        parser_pool.proxy_manager.shutdown()
+        parser_pool.cookie_service.stop()
+        parser_pool.close()
+
+
 @app.get("/health")
 async def health_check():
     """Проверка состояния сервиса"""
-    return {"status": "healthy", "service": "avito-parser-api"}
+    return {
+        "status": "healthy",
+        "service": "avito-parser-api",
+        "parser_pool": parser_pool.stats() if parser_pool else None,
+        "page_cache": page_cache.stats(),
+    }
 
 
 if __name__ == "__main__":
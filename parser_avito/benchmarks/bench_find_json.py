@@ -0,0 +1,65 @@
+"""
+Бенчмарк извлечения JSON каталога со страницы Авито
+
+Сравнивает быстрый путь find_json_on_page (поиск <script> по маркеру типа)
+с полным разбором страницы через BeautifulSoup.
+
+Запуск из папки parser_avito:
+    python -m benchmarks.bench_find_json response.txt other_page.html
+Без аргументов используется синтетическая страница похожего размера.
+"""
+import html
+import json
+import sys
+import timeit
+
+from src.parser_cls import AvitoParse
+
+
+def build_synthetic_page(items_count: int = 50) -> str:
+    """Страница с большим количеством разметки и JSON каталога в <script type="mime/invalid">"""
+    items = [
+        {
+            "id": 4000000000 + i,
+            "title": f"Объявление {i}",
+            "description": "Описание " * 40,
+            "priceDetailed": {"value": 1000 + i},
+            "sortTimeStamp": 1700000000000 + i,
+            "gallery": {"image_urls": [f"https://00.img.avito.st/image/1/{i}_{j}.jpg" for j in range(10)]},
+        }
+        for i in range(items_count)
+    ]
+    state = {"state": {"data": {"catalog": {"items": items}}}}
+    markup = "".join(
+        f'<div class="item" data-marker="item"><a href="/item/{i}">Ссылка {i}</a><span>{i}</span></div>'
+        for i in range(20_000)
+    )
+    return (
+        "<html><head><script>window.__x = 1;</script></head><body>"
+        f"{markup}"
+        f'<script type="mime/invalid" data-mfe-state="true">{html.escape(json.dumps(state))}</script>'
+        "</body></html>"
+    )
+
+
+def soup_only(html_code: str) -> dict:
+    script_content = AvitoParse._find_mime_script_with_soup(html_code)
+    return json.loads(html.unescape(script_content))["state"]
+
+
+def run(html_code: str, label: str, number: int = 5) -> None:
+    assert AvitoParse.find_json_on_page(html_code) == soup_only(html_code), "Результаты не совпадают"
+
+    fast = timeit.timeit(lambda: AvitoParse.find_json_on_page(html_code), number=number) / number
+    slow = timeit.timeit(lambda: soup_only(html_code), number=number) / number
+    print(f"{label}: {len(html_code) / 1024 / 1024:.2f} МБ | "
+          f"быстрый путь {fast * 1000:.1f} мс | BeautifulSoup {slow * 1000:.1f} мс | x{slow / fast:.1f}")
+
+
+if __name__ == "__main__":
+    paths = sys.argv[1:]
+    if not paths:
+        run(build_synthetic_page(), "синтетическая страница")
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            run(f.read(), path)
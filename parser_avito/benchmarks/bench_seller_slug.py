@@ -0,0 +1,55 @@
+"""
+Бенчмарк извлечения продавца из объявлений
+
+Сравнивает старый способ (регулярка по str(ad), т.е. по repr всей модели Item)
+с чтением конкретных полей (userLogo.link и payload шагов IVA).
+
+Запуск из папки parser_avito:
+    python -m benchmarks.bench_seller_slug
+"""
+import re
+import timeit
+
+from src.models import Item
+from src.parser_cls import AvitoParse
+
+
+def build_ads(count: int = 50) -> list[Item]:
+    ads = []
+    for i in range(count):
+        ads.append(Item(
+            id=4000000000 + i,
+            title=f"Объявление {i}",
+            description="Описание " * 40,
+            images=[{"208x156": f"https://00.img.avito.st/image/1/{i}_{j}.jpg"} for j in range(10)],
+            userLogo={"link": f"/brands/seller_{i}?src=search", "src": None, "developerId": None},
+            iva={
+                "DateInfoStep": [{
+                    "componentData": {"component": "DateInfo"},
+                    "payload": {"vas": [{"title": "Продвинуто"}], "absolute": "1 час назад"},
+                    "default": True,
+                }],
+            },
+        ))
+    return ads
+
+
+def old_extract(data):
+    match = re.search(r"/brands/([^/?#]+)", str(data))
+    if match:
+        return match.group(1)
+    return None
+
+
+def run(number: int = 200) -> None:
+    ads = build_ads()
+    assert [old_extract(ad) for ad in ads] == [AvitoParse._extract_seller_slug(ad) for ad in ads]
+
+    old = timeit.timeit(lambda: [old_extract(ad) for ad in ads], number=number) / number
+    new = timeit.timeit(lambda: [AvitoParse._extract_seller_slug(ad) for ad in ads], number=number) / number
+    print(f"{len(ads)} объявлений на странице | str(ad) + regex {old * 1000:.2f} мс | "
+          f"по полям {new * 1000:.3f} мс | x{old / new:.0f}")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,112 @@
+"""
+Однопроходный фильтр объявлений
+
+Конфигурация AvitoConfig один раз компилируется в список проверок,
+после чего каждое объявление проверяется за один проход: ключевые слова
+объединены в одну регулярку, текст объявления приводится к нижнему
+регистру один раз, а признак продвижения вычисляется только если
+фильтр по продвижению включён.
+"""
+import re
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from src.dto import AvitoConfig
+from src.models import is_promoted
+
+# Проверка получает объявление и его текст в нижнем регистре (или None)
+# и возвращает True, если объявление проходит фильтр
+Check = Callable[[object, Optional[str]], bool]
+
+# Поля AvitoConfig, от которых зависит фильтр
+FILTER_FIELDS = (
+    "min_price", "max_price", "keys_word_black_list", "keys_word_white_list",
+    "seller_black_list", "geo", "max_age", "ignore_reserv", "ignore_promotion",
+)
+
+
+def filter_key(config: AvitoConfig) -> tuple:
+    """Ключ фильтра по значениям его полей: одинаковые фильтры разных config совпадают"""
+    values = []
+    for field in FILTER_FIELDS:
+        value = getattr(config, field)
+        values.append(tuple(value) if isinstance(value, list) else value)
+    return tuple(values)
+
+
+def compile_phrases(phrases: List[str]) -> Optional[re.Pattern]:
+    """Объединяет фразы в одну регулярку для поиска подстроки в тексте в нижнем регистре"""
+    phrases = [phrase.lower() for phrase in phrases if phrase]
+    if not phrases:
+        return None
+    # Длинные фразы первыми, чтобы альтернатива не останавливалась на префиксе
+    return re.compile("|".join(re.escape(phrase) for phrase in sorted(set(phrases), key=len, reverse=True)))
+
+
+class AdFilter:
+    def __init__(self, config: AvitoConfig):
+        self.config = config
+        self.key = filter_key(config)
+        self.black_pattern = compile_phrases(config.keys_word_black_list)
+        self.white_pattern = compile_phrases(config.keys_word_white_list)
+        self.seller_black_list = set(config.seller_black_list)
+        self.needs_text = bool(self.black_pattern or self.white_pattern)
+        self.checks: List[Tuple[str, Check]] = self._compile()
+
+    def _compile(self) -> List[Tuple[str, Check]]:
+        config = self.config
+        checks: List[Tuple[str, Check]] = [("price_range", self._check_price)]
+        if self.black_pattern:
+            checks.append(("black_keywords", lambda ad, text: not self.black_pattern.search(text)))
+        if self.white_pattern:
+            checks.append(("white_keywords", lambda ad, text: bool(self.white_pattern.search(text))))
+        if config.geo:
+            checks.append(("address", lambda ad, text: config.geo in ad.geo.formattedAddress))
+        if self.seller_black_list:
+            checks.append(("seller", lambda ad, text: not ad.sellerId or ad.sellerId not in self.seller_black_list))
+        if config.max_age:
+            checks.append(("recent_time", self._check_recent))
+        if config.ignore_reserv:
+            checks.append(("reserve", lambda ad, text: not ad.isReserved))
+        if config.ignore_promotion:
+            checks.append(("promotion", self._check_promotion))
+        return checks
+
+    def _check_price(self, ad, text) -> bool:
+        return self.config.min_price <= ad.priceDetailed.value <= self.config.max_price
+
+    def _check_recent(self, ad, text) -> bool:
+        return ad.sortTimeStamp >= self._min_timestamp_ms
+
+    @staticmethod
+    def _check_promotion(ad, text) -> bool:
+        ad.isPromotion = is_promoted(ad)
+        return not ad.isPromotion
+
+    def apply(self, ads: list) -> Tuple[list, Dict[str, int]]:
+        """
+        Возвращает прошедшие фильтр объявления и число отсеянных каждым фильтром
+
+        Если проверка падает на конкретном объявлении (нет цены, адреса и т.п.),
+        объявление считается прошедшим эту проверку.
+        """
+        self._min_timestamp_ms = (time.time() - self.config.max_age) * 1000
+        rejected = {name: 0 for name, _ in self.checks}
+        passed = []
+
+        for ad in ads:
+            text = None
+            if self.needs_text:
+                text = ((ad.title or "") + (ad.description or "")).lower()
+            for name, check in self.checks:
+                try:
+                    ok = check(ad, text)
+                except Exception:
+                    ok = True
+                if not ok:
+                    rejected[name] += 1
+                    break
+            else:
+                passed.append(ad)
+
+        return passed, rejected
@@ -44,6 +44,7 @@ def get_avito_config() -> AvitoConfig:
     🌍 ЛОКАЦИЯ И ПРОКСИ:
         geo - географический регион (из .env: GEO)
         proxy_string - строка прокси (из .env: PROXY_STRING)
+        proxy_strings - список прокси (из .env: PROXY_STRINGS)
         proxy_change_url - URL для смены IP (из .env: PROXY_CHANGE_URL)
         
     ⏱️ ТАЙМАУТЫ И ПАУЗЫ:
@@ -61,6 +62,12 @@ def get_avito_config() -> AvitoConfig:
     🔧 РЕЖИМЫ РАБОТЫ:
         one_time_start - однократный запуск (False = работает в цикле)
         one_file_for_link - создавать отдельный файл для каждой ссылки (False)
+        
+    👁️ ПРОСМОТРЫ:
+        parse_views - загружать просмотры из карточек объявлений (False)
+        views_concurrency - одновременных загрузок карточек (4)
+        views_rate - карточек в секунду на все загрузки (3)
+        views_cache_ttl - сколько секунд просмотры объявления не обновляются (6 часов)
     """
     
     # 📋 URLs для парсинга - добавьте сюда ваши ссылки с фильтрами Avito
@@ -83,6 +90,8 @@ def get_avito_config() -> AvitoConfig:
         # 🌍 Локация и прокси (из переменных окружения)
         geo="",                          # Регион поиска
         proxy_string=os.getenv("PROXY_STRING", ""),        # Прокси сервер
+        # Несколько прокси (формат: "proxy1|proxy2"), выдаются менеджером прокси по здоровью
+        proxy_strings=[proxy.strip() for proxy in os.getenv("PROXY_STRINGS", "").split("|") if proxy.strip()],
         proxy_change_url=os.getenv("PROXY_CHANGE_URL", ""), # URL смены IP (fallback)
         # Список ссылок для смены IP (формат: "url1|url2|url3")
         proxy_change_urls=[url.strip() for url in os.getenv("PROXY_CHANGE_URLS", "").split("|") if url.strip()],
@@ -100,6 +109,12 @@ def get_avito_config() -> AvitoConfig:
         # 🔧 Режимы работы
         one_time_start=False,    # True = однократный запуск
         one_file_for_link=False, # True = отдельный файл для каждой ссылки
+        
+        # 👁️ Просмотры объявлений
+        parse_views=False,         # True = загружать просмотры из карточек
+        views_concurrency=4,       # Одновременных загрузок карточек
+        views_rate=3.0,            # Карточек в секунду
+        views_cache_ttl=6 * 60 * 60,  # Просмотры объявления обновляются не чаще (секунды)
     )
 
 
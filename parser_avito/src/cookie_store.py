@@ -0,0 +1,172 @@
+"""
+Общее хранилище cookies и фоновое обновление через Playwright
+
+CookieService держит прогретый браузер в отдельном потоке со своим event loop,
+периодически (и по запросу) получает свежие cookies Авито и публикует их
+в CookieStore. Парсеры только читают хранилище, поэтому путь запроса
+никогда не ждёт запуска браузера.
+"""
+import asyncio
+import json
+import os
+import random
+import threading
+import time
+from typing import Optional, Tuple
+
+from loguru import logger
+
+from src.dto import Proxy
+from src.get_cookies import PlaywrightClient
+
+DEFAULT_REFRESH_INTERVAL = 30 * 60  # Плановое обновление cookies, секунды
+MIN_REFRESH_GAP = 30  # Не обновляем по запросу чаще, чем раз в столько секунд
+RETRY_DELAY = 60  # Пауза после неудачного обновления, секунды
+
+
+class CookieStore:
+    """
+    Потокобезопасное хранилище cookies
+
+    Если указан path, cookies дополнительно сохраняются в файл атомарной
+    заменой (запись во временный файл + os.replace) и читаются из него при старте.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self._lock = threading.Lock()
+        self._cookies: dict = {}
+        self._user_agent: Optional[str] = None
+        self.version = 0  # Растёт при каждой публикации
+        self.updated_at: Optional[float] = None
+        if path:
+            self._load()
+
+    def _load(self) -> None:
+        try:
+            with open(self.path, "r") as f:
+                self._cookies = json.load(f)
+                self.version += 1
+        except (FileNotFoundError, json.JSONDecodeError):
+            pass
+
+    def get(self) -> Tuple[dict, Optional[str]]:
+        with self._lock:
+            return dict(self._cookies), self._user_agent
+
+    def publish(self, cookies: dict, user_agent: Optional[str] = None) -> None:
+        with self._lock:
+            self._cookies = dict(cookies)
+            self._user_agent = user_agent or self._user_agent
+            self.version += 1
+            self.updated_at = time.time()
+        if self.path:
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(cookies, f)
+            os.replace(tmp_path, self.path)
+
+    @property
+    def age(self) -> Optional[float]:
+        """Сколько секунд назад cookies обновлялись (None - ещё не обновлялись)"""
+        return time.time() - self.updated_at if self.updated_at else None
+
+
+class CookieService:
+    def __init__(
+            self,
+            store: CookieStore,
+            proxy: Optional[Proxy] = None,
+            refresh_interval: float = DEFAULT_REFRESH_INTERVAL,
+            headless: bool = True,
+    ):
+        self.store = store
+        self.proxy = proxy
+        self.refresh_interval = refresh_interval
+        self.headless = headless
+        self.refresh_count = 0
+        self.error_count = 0
+        self._thread: Optional[threading.Thread] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._stopping = False
+        self._lock = threading.Lock()
+        self._last_request = 0.0
+
+    def start(self) -> bool:
+        """
+        Запускает фоновый поток обновления; False - поток уже работал
+
+        Не ждёт первого обновления и готовности цикла событий потока, поэтому
+        безопасен для вызова из async-кода (startup FastAPI).
+        """
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return False
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name="cookie-refresher", daemon=True)
+            self._thread.start()
+        return True
+
+    def stop(self) -> None:
+        self._stopping = True
+        if self._loop and self._wake:
+            self._loop.call_soon_threadsafe(self._wake.set)
+
+    def request_refresh(self) -> None:
+        """Просит обновить cookies как можно скорее; не блокирует вызывающий поток"""
+        now = time.monotonic()
+        # Вызывается из многих потоков парсинга сразу: проверка и отметка времени атомарны
+        with self._lock:
+            if now - self._last_request < MIN_REFRESH_GAP:
+                return
+            self._last_request = now
+        if self.start():
+            return  # Только что запущенный поток сразу начинает с обновления
+        if self._loop and self._wake:
+            logger.info("[cookies] Запрошено внеплановое обновление cookies")
+            self._loop.call_soon_threadsafe(self._wake.set)
+
+    def _run(self) -> None:
+        asyncio.run(self._main())
+
+    async def _main(self) -> None:
+        # Событие создаётся раньше ссылки на цикл: stop() и request_refresh() проверяют оба
+        self._wake = asyncio.Event()
+        self._loop = asyncio.get_running_loop()
+        client = PlaywrightClient(proxy=self.proxy, headless=self.headless)
+        try:
+            while not self._stopping:
+                delay = self.refresh_interval if await self._refresh(client) else RETRY_DELAY
+                try:
+                    await asyncio.wait_for(self._wake.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                self._wake.clear()
+        finally:
+            await client.close()
+
+    async def _refresh(self, client: PlaywrightClient) -> bool:
+        ads_id = str(random.randint(1111111111, 9999999999))
+        try:
+            cookies = await client.refresh_cookies(f"https://www.avito.ru/{ads_id}")
+            if not cookies:
+                raise ValueError("Пустой результат cookies")
+            self.store.publish(cookies, client.user_agent)
+            self.refresh_count += 1
+            logger.info(f"[cookies] Cookies обновлены ({len(cookies)} шт.)")
+            return True
+        except Exception as err:
+            self.error_count += 1
+            logger.warning(f"[cookies] Не удалось обновить cookies: {err}")
+            # Перезапускаем браузер при следующей попытке
+            await client.close()
+            return False
+
+    def stats(self) -> dict:
+        return {
+            "running": bool(self._thread and self._thread.is_alive()),
+            "refreshes": self.refresh_count,
+            "errors": self.error_count,
+            "age": round(self.store.age, 1) if self.store.age is not None else None,
+        }
@@ -20,6 +20,7 @@ class ProxySplit:
 class AvitoConfig:
     urls: List[str]
     proxy_string: Optional[str] = None
+    proxy_strings: List[str] = field(default_factory=list)  # Несколько прокси для менеджера прокси
     proxy_change_url: str = None
     proxy_change_urls: List[str] = field(default_factory=list)  # Список ссылок для смены IP
     keys_word_white_list: List[str] = field(default_factory=list)
@@ -39,3 +40,6 @@ class AvitoConfig:
     one_time_start: bool = False
     one_file_for_link: bool = False
     parse_views: bool = False
+    views_concurrency: int = 4  # Одновременных загрузок карточек для просмотров
+    views_rate: float = 3.0  # Не больше стольких карточек в секунду (0 - без ограничения)
+    views_cache_ttl: int = 6 * 60 * 60  # Сколько секунд просмотры объявления считаются свежими
@@ -145,6 +145,26 @@ class PlaywrightClient:
     async def get_cookies(self, url: str) -> dict:
         return await self.extract_cookies(url)
 
+    async def refresh_cookies(self, url: str) -> dict:
+        """Получает cookies, переиспользуя уже запущенный браузер"""
+        if not self.browser or not self.browser.is_connected():
+            await self.launch_browser()
+        else:
+            await self.context.clear_cookies()
+        return await self.load_page(url)
+
+    async def close(self):
+        """Закрывает браузер, запущенный для refresh_cookies"""
+        try:
+            if self.browser:
+                await self.browser.close()
+            if getattr(self, "playwright", None):
+                await self.playwright.stop()
+        except Exception as err:
+            logger.debug(f"Ошибка при закрытии браузера: {err}")
+        finally:
+            self.context = self.page = self.browser = self.playwright = None
+
     async def check_block(self, page, context):
         title = await page.title()
         logger.info(f"Не ошибка, а название страницы: {title}")
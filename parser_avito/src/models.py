@@ -7,11 +7,19 @@
 изображения, контакты и другие элементы.
 
 Основная модель Item представляет полную структуру объявления со всеми
-возможными полями и вложенными объектами.
+возможными полями и вложенными объектами. Облегчённая модель CatalogItem
+валидирует только поля, нужные фильтрам и ответу API.
 """
 
-from pydantic import BaseModel, HttpUrl, RootModel
-from typing import List, Optional, Dict, Any
+from pydantic import BaseModel, HttpUrl, RootModel, PrivateAttr
+from typing import List, Optional, Dict, Any, Tuple
+
+# Курсор каталога: (sortTimeStamp, id) самого нового из уже просмотренных объявлений
+CatalogCursor = Tuple[int, int]
+
+# Сколько подряд уже просмотренных объявлений означает, что дальше новых нет.
+# Больше одного: в начале выдачи могут стоять старые закреплённые объявления
+CURSOR_STOP_AFTER = 5
 
 
 class Category(BaseModel):
@@ -184,3 +192,163 @@ class Item(BaseModel):
 class ItemsResponse(BaseModel):
     """Ответ API со списком объявлений"""
     items: List[Item]  # Список объявлений
+
+
+
+# =================== ОБЛЕГЧЁННЫЕ МОДЕЛИ ДЛЯ API ===================
+
+
+class PriceLite(BaseModel):
+    """Цена объявления: только числовое значение"""
+    value: int | None = None
+
+
+class GeoLite(BaseModel):
+    """Адрес объявления для фильтра по региону"""
+    formattedAddress: str | None = None
+
+
+class UserLogoLite(BaseModel):
+    """Ссылка на профиль продавца"""
+    link: str | None = None
+
+
+class IvaStepLite(BaseModel):
+    """Шаг IVA без валидации вложенного компонента"""
+    payload: Optional[Dict[str, Any]] = None
+
+
+class CatalogItem(BaseModel):
+    """
+    Облегчённое объявление для горячего пути API
+
+    Валидирует только поля, которые используют фильтры и ответ API.
+    Остальные поля (галерея, контакты, изображения...) не разбираются;
+    полная модель Item доступна через to_item().
+    """
+    id: int | dict | None = None
+    urlPath: str | None = None
+    title: str | None = None
+    description: str | None = None
+    sortTimeStamp: int | None = None
+    priceDetailed: PriceLite | None = None
+    geo: GeoLite | None = None
+    userLogo: UserLogoLite | None = None
+    iva: Dict[str, List[IvaStepLite]] | None = None
+    isReserved: bool | None = None
+    sellerId: str | None = None
+    isPromotion: bool = False
+    total_views: int | None = None
+    today_views: int | None = None
+
+    _raw: Dict[str, Any] = PrivateAttr(default_factory=dict)
+
+    @classmethod
+    def from_raw(cls, raw: Dict[str, Any]) -> "CatalogItem":
+        item = cls.model_validate(raw)
+        item._raw = raw
+        return item
+
+    def to_item(self) -> Item:
+        """Полная валидация объявления (по требованию)"""
+        item = Item(**self._raw)
+        item.sellerId = self.sellerId
+        item.isPromotion = self.isPromotion
+        item.total_views = self.total_views
+        item.today_views = self.today_views
+        return item
+
+
+def catalog_sort_key(raw: Dict[str, Any]) -> Optional[CatalogCursor]:
+    """Ключ (sortTimeStamp, id) сырого объявления без валидации или None"""
+    sort_timestamp, ad_id = raw.get("sortTimeStamp"), raw.get("id")
+    if isinstance(sort_timestamp, int) and isinstance(ad_id, int):
+        return sort_timestamp, ad_id
+    return None
+
+
+PROMOTION_TITLE = "Продвинуто"
+
+
+def is_promoted(ad: Any) -> bool:
+    """Продвинуто ли объявление (по шагу DateInfoStep в IVA); ad - модель или сырой словарь"""
+    def field(obj: Any, name: str) -> Any:
+        return obj.get(name) if isinstance(obj, dict) else getattr(obj, name, None)
+
+    return any(
+        vas.get("title") == PROMOTION_TITLE
+        for step in ((field(ad, "iva") or {}).get("DateInfoStep") or [])
+        for vas in ((field(step, "payload") or {}).get("vas") or [])
+    )
+
+
+def catalog_is_exhausted(
+        catalog: Dict[str, Any],
+        after: Optional[CatalogCursor] = None,
+        min_timestamp: Optional[int] = None,
+) -> bool:
+    """
+    Нет ли на странице каталога новых объявлений
+
+    True, если страница пуста или все её объявления (кроме продвинутых) не новее
+    курсора after либо старше min_timestamp (мс) - следующие страницы ещё старше.
+    """
+    keys = [
+        key for key in (catalog_sort_key(raw) for raw in catalog.get("items", []) if not is_promoted(raw))
+        if key
+    ]
+    return all(
+        (after is not None and key <= after) or (min_timestamp is not None and key[0] < min_timestamp)
+        for key in keys
+    )
+
+
+def merge_catalogs(catalogs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Склеивает страницы каталога: без повторов (объявления сдвигаются между страницами), от новых к старым"""
+    items: Dict[Any, Dict[str, Any]] = {}
+    for catalog in catalogs:
+        for raw in catalog.get("items", []):
+            ad_id = raw.get("id")
+            key = ad_id if isinstance(ad_id, int) else id(raw)
+            items.setdefault(key, raw)
+    return {"items": sorted(items.values(), key=lambda raw: raw.get("sortTimeStamp") or 0, reverse=True)}
+
+
+class CatalogResponse(BaseModel):
+    """Каталог с облегчёнными объявлениями"""
+    items: List[CatalogItem]
+    cursor: Optional[CatalogCursor] = None  # Ключ самого нового объявления страницы
+
+    @classmethod
+    def from_catalog(cls, catalog: Dict[str, Any], after: Optional[CatalogCursor] = None) -> "CatalogResponse":
+        """
+        Валидирует объявления каталога
+
+        С курсором after возвращает только объявления новее него: уже просмотренные
+        пропускаются без валидации, а после CURSOR_STOP_AFTER таких подряд разбор
+        останавливается (выдача отсортирована по дате). Объявления без ключа
+        возвращаются всегда - их отсеет дедупликация клиента.
+        """
+        raw_items = catalog.get("items", [])
+        if after is None:
+            items = [CatalogItem.from_raw(raw) for raw in raw_items]
+            keys = [key for key in map(catalog_sort_key, raw_items) if key]
+            return cls.model_construct(items=items, cursor=max(keys, default=None))
+
+        items = []
+        cursor = after
+        seen_in_row = 0
+        for raw in raw_items:
+            key = catalog_sort_key(raw)
+            if key is not None and key <= after:
+                # Продвинутые объявления поднимаются наверх вне порядка дат - их не считаем
+                if not is_promoted(raw):
+                    seen_in_row += 1
+                    if seen_in_row >= CURSOR_STOP_AFTER:
+                        break
+                continue
+            if key is not None:
+                seen_in_row = 0
+                cursor = max(cursor, key)
+            items.append(CatalogItem.from_raw(raw))
+        return cls.model_construct(items=items, cursor=cursor)
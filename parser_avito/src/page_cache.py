@@ -0,0 +1,120 @@
+"""
+Кэш страниц каталога с короткой жизнью и склейкой одновременных запросов
+
+Один и тот же поиск Avito часто запрашивают несколько раз за секунды:
+разные пользователи бота, повторы по таймауту, проверки администратора.
+PageCache хранит каталог страницы по канонической ссылке TTL секунд, а
+одновременные запросы одной ссылки ждут единственную загрузку (single-flight)
+вместо того, чтобы каждый вызывал AvitoParse.fetch_data. Кэшируется каталог
+до фильтров и курсора, поэтому его разделяют запросы с разными параметрами.
+Используется из потоков пула парсинга, все операции потокобезопасны.
+"""
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from loguru import logger
+
+from src.avito_url import canonicalize_avito_url
+
+DEFAULT_TTL = 30  # Секунды жизни страницы в кэше
+DEFAULT_MAX_ENTRIES = 1000
+
+
+class PageCache:
+    def __init__(self, ttl: float = DEFAULT_TTL, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()  # ключ -> (момент устаревания, каталог)
+        self._loading: Dict[str, Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0  # Запросы, дождавшиеся чужой загрузки
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0
+
+    def get_or_load(self, url: str, loader: Callable[[], Optional[Any]]) -> Optional[Any]:
+        """
+        Возвращает каталог страницы из кэша или загружает его через loader
+
+        Пустой результат (None) не кэшируется, но отдаётся всем, кто ждал
+        этой загрузки. Исключение loader пробрасывается им же.
+        """
+        if not self.enabled:
+            return loader()
+
+        key = canonicalize_avito_url(url)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry:
+                del self._entries[key]  # Устарела
+            future = self._loading.get(key)
+            owner = future is None
+            if owner:
+                future = self._loading[key] = Future()
+                self.misses += 1
+            else:
+                self.coalesced += 1
+
+        if not owner:
+            return future.result()
+
+        try:
+            value = loader()
+        except BaseException as err:
+            with self._lock:
+                self._loading.pop(key, None)
+            future.set_exception(err)
+            raise
+
+        with self._lock:
+            if value is not None:
+                self._store(key, value)
+            self._loading.pop(key, None)
+        future.set_result(value)
+        return value
+
+    def _store(self, key: str, value: Any) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def evict(self, url: Optional[str] = None) -> int:
+        """Удаляет страницу по ссылке или весь кэш; возвращает число удалённых записей"""
+        with self._lock:
+            if url is None:
+                removed = len(self._entries)
+                self._entries.clear()
+            else:
+                removed = 1 if self._entries.pop(canonicalize_avito_url(url), None) is not None else 0
+        logger.info(f"Из кэша страниц удалено записей: {removed}")
+        return removed
+
+    def stats(self) -> dict:
+        with self._lock:
+            now = time.monotonic()
+            lookups = self.hits + self.misses + self.coalesced
+            return {
+                "ttl": self.ttl,
+                "size": len(self._entries),
+                "fresh": sum(1 for expires_at, _ in self._entries.values() if expires_at > now),
+                "max_entries": self.max_entries,
+                "loading": len(self._loading),
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "hit_rate": round((self.hits + self.coalesced) / lookups, 3) if lookups else 0.0,
+                "evictions": self.evictions,
+            }
@@ -1,28 +1,40 @@
-import asyncio
 import html
 import json
-import random
+import queue
 import re
+import threading
 import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from urllib.parse import unquote, urlparse, parse_qs, urlencode, urlunparse
-from datetime import datetime, timedelta
 
 from bs4 import BeautifulSoup
 from curl_cffi import requests
 from loguru import logger
 from pydantic import ValidationError
-from requests.cookies import RequestsCookieJar
 
+from src.ad_filter import AdFilter, filter_key
 from src.common_data import HEADERS
 from src.dto import Proxy, AvitoConfig
-from src.get_cookies import get_cookies
+from src.cookie_store import CookieService, CookieStore
 from src.hide_private_data import log_config
 from src.config import get_avito_config
 from src.models import ItemsResponse, Item
+from src.proxy_manager import ProxyManager, ProxyState
+from src.views import RateLimiter, extract_views, views_cache
 
 
 DEBUG_MODE = False
 
+# Ссылка на профиль продавца-магазина
+SELLER_SLUG_RE = re.compile(r"/brands/([^/?#]+)")
+
+# Открывающий тег <script> с JSON каталога: атрибуты могут идти в любом порядке
+MIME_SCRIPT_OPEN_RE = re.compile(r"""<script\b[^>]*\btype=["']?mime/invalid["']?[^>]*>""", re.IGNORECASE)
+
+# Сколько скомпилированных фильтров держит один парсер
+FILTER_CACHE_SIZE = 64
+
 logger.add("logs/app.log", rotation="5 MB", retention="5 days", level="DEBUG")
 
 
@@ -30,98 +42,93 @@ class AvitoParse:
     def __init__(
             self,
             config: AvitoConfig,
-            stop_event=None
+            stop_event=None,
+            proxy_manager: ProxyManager | None = None,
+            cookie_service: CookieService | None = None
     ):
         self.config = config
+        self.proxy_manager = proxy_manager or ProxyManager.from_config(config)
         self.proxy_obj = self.get_proxy_obj()
+        # Свежие cookies готовит фоновый сервис; поток запускается при первой необходимости
+        self.cookie_service = cookie_service or CookieService(store=CookieStore(), proxy=self.proxy_obj)
+        self._cookies_version = 0
         self.stop_event = stop_event
         self.cookies = None
         self.session = requests.Session()
-        self.headers = HEADERS
+        self.headers = dict(HEADERS)  # Своя копия: user-agent меняется независимо у каждого парсера
         self.good_request_count = 0
         self.bad_request_count = 0
-        self.current_ip = None  # Текущий IP для проверки
-        self.current_url_index = 0  # Индекс текущей ссылки для смены IP
+        self.current_proxy: ProxyState | None = None  # Прокси последнего запроса
+        # Скомпилированные фильтры по значениям полей фильтра: пул подставляет новый config на каждый запрос
+        self._ad_filters: "OrderedDict[tuple, AdFilter]" = OrderedDict()
+        self.last_filter_stats: dict = {}  # Сколько объявлений отсеял каждый фильтр в последний раз
+        # Прогретые сессии потоков загрузки просмотров: переживают вызовы parse_views, закрываются в close()
+        self._views_sessions: queue.LifoQueue = queue.LifoQueue()
+        self._counters_lock = threading.Lock()  # Счётчики запросов меняют и потоки просмотров
 
         log_config(config=self.config)
 
     def get_proxy_obj(self) -> Proxy | None:
+        return self.proxy_for_cookies(self.config)
+
+    @staticmethod
+    def proxy_for_cookies(config: AvitoConfig) -> Proxy | None:
+        """Прокси для браузера, получающего cookies"""
         # Определяем какую ссылку использовать для Proxy объекта
         change_ip_link = None
-        if self.config.proxy_change_urls:  # Приоритет - первая ссылка из списка
-            change_ip_link = self.config.proxy_change_urls[0]
-        elif self.config.proxy_change_url:  # Fallback - одна ссылка
-            change_ip_link = self.config.proxy_change_url
+        if config.proxy_change_urls:  # Приоритет - первая ссылка из списка
+            change_ip_link = config.proxy_change_urls[0]
+        elif config.proxy_change_url:  # Fallback - одна ссылка
+            change_ip_link = config.proxy_change_url
         
-        if self.config.proxy_string and change_ip_link:
+        proxy_string = config.proxy_string or next(iter(config.proxy_strings), None)
+        if proxy_string and change_ip_link:
             return Proxy(
-                proxy_string=self.config.proxy_string,
+                proxy_string=proxy_string,
                 change_ip_link=change_ip_link
             )
-        logger.info("Работаем без прокси")
         return None
 
-    def get_cookies(self, max_retries: int = 1, delay: float = 2.0) -> dict | None:
-        for attempt in range(1, max_retries + 1):
-            try:
-                # Безопасный вызов асинхронной функции в синхронном контексте
-                try:
-                    loop = asyncio.get_running_loop()
-                    # Если event loop уже запущен, создаем новый поток
-                    import concurrent.futures
-                    with concurrent.futures.ThreadPoolExecutor() as executor:
-                        future = executor.submit(asyncio.run, get_cookies(proxy=self.proxy_obj, headless=True))
-                        cookies, user_agent = future.result()
-                except RuntimeError:
-                    # Если нет запущенного event loop, используем asyncio.run
-                    cookies, user_agent = asyncio.run(get_cookies(proxy=self.proxy_obj, headless=True))
-                if cookies:
-                    logger.info(f"[get_cookies] Успешно получены cookies с попытки {attempt}")
-
-                    self.headers["user-agent"] = user_agent
-                    return cookies
-                else:
-                    raise ValueError("Пустой результат cookies")
-            except Exception as e:
-                logger.warning(f"[get_cookies] Попытка {attempt} не удалась: {e}")
-                if attempt < max_retries:
-                    time.sleep(delay * attempt)  # увеличиваем задержку
-                else:
-                    logger.error(f"[get_cookies] Все {max_retries} попытки не удались")
-                    return None
-
-    def save_cookies(self) -> None:
-        """Сохраняет cookies из requests.Session в JSON-файл."""
-        with open("cookies.json", "w") as f:
-            json.dump(self.session.cookies.get_dict(), f)
-
-    def load_cookies(self) -> None:
-        """Загружает cookies из JSON-файла в requests.Session."""
-        try:
-            with open("cookies.json", "r") as f:
-                cookies = json.load(f)
-                jar = RequestsCookieJar()
-                for k, v in cookies.items():
-                    jar.set(k, v)
-                self.session.cookies.update(jar)
-        except FileNotFoundError:
-            pass
+    def get_cookies(self) -> dict | None:
+        """
+        Просит фоновый сервис обновить cookies и возвращает текущие из хранилища
+
+        Не ждёт браузер: свежие cookies подхватятся следующими попытками запроса.
+        """
+        self.cookie_service.request_refresh()
+        self._sync_cookies()
+        return self.cookies
+
+    def _sync_cookies(self) -> None:
+        """Подхватывает cookies и user-agent, если сервис опубликовал новые"""
+        store = self.cookie_service.store
+        if store.version == self._cookies_version:
+            return
+        cookies, user_agent = store.get()
+        self._cookies_version = store.version
+        self.cookies = cookies or None
+        if user_agent:
+            self.headers["user-agent"] = user_agent
 
     def fetch_data(self, url, retries=3, backoff_factor=1):
-        proxy_data = None
-        use_http3 = True
-        timeout = 20  # Таймаут по умолчанию
-        if self.proxy_obj:
-            proxy_url = f"http://{self.config.proxy_string}"
-            proxy_data = {"http": proxy_url, "https": proxy_url}
-            use_http3 = True  # Отключаем HTTP/3 при использовании прокси
-            timeout = 60  # Увеличиваем таймаут для прокси (парсинг Авито может быть медленным)
-            logger.info(f"Используем прокси: {self.config.proxy_string.split('@')[1] if '@' in self.config.proxy_string else 'скрыт'}")
-
         for attempt in range(1, retries + 1):
             if self.stop_event and self.stop_event.is_set():
                 return
 
+            self._sync_cookies()
+
+            # На каждую попытку берём самый здоровый прокси из менеджера
+            proxy = self.proxy_manager.acquire()
+            self.current_proxy = proxy
+            proxy_data = None
+            use_http3 = True
+            timeout = 20  # Таймаут по умолчанию
+            if proxy:
+                proxy_data = {"http": proxy.url, "https": proxy.url}
+                timeout = 60  # Увеличиваем таймаут для прокси (парсинг Авито может быть медленным)
+                logger.info(f"Используем прокси: {proxy.host}")
+
+            started_at = time.monotonic()
             try:
                 request_params = {
                     "url": url,
@@ -143,15 +150,17 @@ class AvitoParse:
                 if response.status_code == 429:
                     self.bad_request_count += 1
                     self.session = requests.Session()
-                    self.change_ip()
+                    # Смена IP идёт в фоне, следующая попытка уйдёт через другой прокси
+                    self.proxy_manager.report_ban(proxy)
                     if attempt >= 3:
                         self.cookies = self.get_cookies()
                     raise requests.RequestsError(f"Слишком много запросов: {response.status_code}")
                 if response.status_code in [403, 302]:
+                    self.proxy_manager.report_failure(proxy)
                     self.cookies = self.get_cookies()
                     raise requests.RequestsError(f"Заблокирован: {response.status_code}")
 
-                self.save_cookies()
+                self.proxy_manager.report_success(proxy, latency=time.monotonic() - started_at)
                 self.good_request_count += 1
                 return response.text
             except requests.RequestsError as e:
@@ -160,10 +169,8 @@ class AvitoParse:
                 
                 # Проверяем на ошибку прокси (502, 503, connect failed, timeout, connection timeout)
                 if any(err in error_str for err in ["502", "503", "CONNECT tunnel failed", "(56)", "Connection timed out", "(28)", "timed out"]):
-                    logger.warning("Ошибка прокси/сети! Пытаемся сменить IP...")
-                    if self.proxy_obj:
-                        self.change_ip()
-                        time.sleep(2)  # Небольшая пауза после смены IP
+                    logger.warning("Ошибка прокси/сети! Отправляем прокси на смену IP...")
+                    self.proxy_manager.report_failure(proxy, rotate=True)
                 
                 if attempt < retries:
                     sleep_time = backoff_factor * attempt
@@ -172,10 +179,10 @@ class AvitoParse:
                 else:
                     logger.info("Все попытки были неуспешными")
                     return None
+            finally:
+                self.proxy_manager.release(proxy)
 
     def parse(self):
-        self.load_cookies()
-
         for _index, url in enumerate(self.config.urls):
             for i in range(0, self.config.count):
                 if self.stop_event and self.stop_event.is_set():
@@ -221,83 +228,67 @@ class AvitoParse:
 
     @staticmethod
     def find_json_on_page(html_code, data_type: str = "mime") -> dict:
-        soup = BeautifulSoup(html_code, "html.parser")
+        if data_type != 'mime':
+            return {}
         try:
-            for _script in soup.select('script'):
-                script_type = _script.get('type')
+            # Быстрый путь: ищем нужный <script> сканированием строки, без разбора всего DOM
+            script_content = AvitoParse._find_mime_script_fast(html_code)
+            if script_content is None:
+                # Запасной путь: полноценный разбор страницы
+                script_content = AvitoParse._find_mime_script_with_soup(html_code)
+            if script_content is None:
+                return {}
 
-                if data_type == 'mime' and script_type == 'mime/invalid':
-                    script_content = html.unescape(_script.text)
-                    parsed_data = json.loads(script_content)
+            parsed_data = json.loads(html.unescape(script_content))
 
-                    if 'state' in parsed_data:
-                        return parsed_data['state']
+            if 'state' in parsed_data:
+                return parsed_data['state']
 
-                    elif 'data' in parsed_data:
-                        logger.info("data")
-                        return parsed_data['data']
+            elif 'data' in parsed_data:
+                logger.info("data")
+                return parsed_data['data']
 
-                    else:
-                        return parsed_data
+            else:
+                return parsed_data
 
         except Exception as err:
             logger.error(f"Ошибка при поиске информации на странице: {err}")
         return {}
 
-    def filter_ads(self, ads: list[Item]) -> list[Item]:
-        """Сортирует объявления"""
-        filters = [
-            self._filter_by_price_range,
-            self._filter_by_black_keywords,
-            self._filter_by_white_keyword,
-            self._filter_by_address,
-            self._filter_by_seller,
-            self._filter_by_recent_time,
-            self._filter_by_reserve,
-            self._filter_by_promotion,
-        ]
-
-        for filter_fn in filters:
-            ads = filter_fn(ads)
-            logger.info(f"После фильтрации {filter_fn.__name__} осталось {len(ads)}")
-            if not len(ads):
-                return ads
-        return ads
-
-    def _filter_by_price_range(self, ads: list[Item]) -> list[Item]:
-        try:
-            return [ad for ad in ads if self.config.min_price <= ad.priceDetailed.value <= self.config.max_price]
-        except Exception as err:
-            logger.debug(f"Ошибка при фильтрации по цене: {err}")
-            return ads
-
-    def _filter_by_black_keywords(self, ads: list[Item]) -> list[Item]:
-        if not self.config.keys_word_black_list:
-            return ads
-        try:
-            return [ad for ad in ads if not self._is_phrase_in_ads(ad=ad, phrases=self.config.keys_word_black_list)]
-        except Exception as err:
-            logger.debug(f"Ошибка при проверке объявлений по списку стоп-слов: {err}")
-            return ads
+    @staticmethod
+    def _find_mime_script_fast(html_code: str) -> str | None:
+        """Возвращает содержимое первого <script type="mime/invalid"> или None"""
+        match = MIME_SCRIPT_OPEN_RE.search(html_code)
+        if not match:
+            return None
+        end = html_code.find("</script>", match.end())
+        if end == -1:
+            return None
+        return html_code[match.end():end]
 
-    def _filter_by_white_keyword(self, ads: list[Item]) -> list[Item]:
-        if not self.config.keys_word_white_list:
-            return ads
-        try:
-            return [ad for ad in ads if self._is_phrase_in_ads(ad=ad, phrases=self.config.keys_word_white_list)]
-        except Exception as err:
-            logger.debug(f"Ошибка при проверке объявлений по списку обязательных слов: {err}")
-            return ads
+    @staticmethod
+    def _find_mime_script_with_soup(html_code: str) -> str | None:
+        soup = BeautifulSoup(html_code, "html.parser")
+        for _script in soup.select('script'):
+            if _script.get('type') == 'mime/invalid':
+                return _script.text
+        return None
 
-    def _filter_by_address(self, ads: list[Item]) -> list[Item]:
-        if not self.config.geo:
-            return ads
-        try:
-            return [ad for ad in ads if self.config.geo in ad.geo.formattedAddress]
-        except Exception as err:
-            logger.debug(f"Ошибка при проверке объявлений по адресу: {err}")
-            return ads
+    def filter_ads(self, ads: list[Item]) -> list[Item]:
+        """Фильтрует объявления за один проход скомпилированным фильтром"""
+        key = filter_key(self.config)
+        ad_filter = self._ad_filters.get(key)
+        if ad_filter is None:
+            ad_filter = self._ad_filters[key] = AdFilter(self.config)
+            if len(self._ad_filters) > FILTER_CACHE_SIZE:
+                self._ad_filters.popitem(last=False)
+        else:
+            self._ad_filters.move_to_end(key)
 
+        filtered, rejected = ad_filter.apply(ads)
+        self.last_filter_stats = rejected
+        logger.info(f"После фильтрации осталось {len(filtered)} из {len(ads)}, отсеяно: {rejected}")
+        return filtered
 
     def _add_seller_to_ads(self, ads: list[Item]) -> list[Item]:
         for ad in ads:
@@ -305,187 +296,165 @@ class AvitoParse:
                 ad.sellerId = seller_id
         return ads
 
-    @staticmethod
-    def _add_promotion_to_ads(ads: list[Item]) -> list[Item]:
+    def parse_views(self, ads: list[Item]) -> list[Item]:
+        """
+        Дополняет объявления просмотрами из их карточек
+
+        Свежие просмотры берутся из кэша, остальные карточки загружаются
+        параллельно (views_concurrency потоков, у каждого своя сессия из пула)
+        с общим ограничением views_rate карточек в секунду. Потоки не меняют
+        состояние парсера (сессию, cookies, текущий прокси) - см. _fetch_views_page.
+        """
+        if not self.config.parse_views:
+            return ads
+
+        pending = []
         for ad in ads:
-            ad.isPromotion = any(
-                v.get("title") == "Продвинуто"
-                for step in (ad.iva or {}).get("DateInfoStep", [])
-                for v in step.payload.get("vas", [])
-            )
-        return ads
+            cached = views_cache.get(ad.id, self.config.views_cache_ttl) if isinstance(ad.id, int) else None
+            if cached:
+                ad.total_views, ad.today_views = cached
+            else:
+                pending.append(ad)
 
-    def _filter_by_seller(self, ads: list[Item]) -> list[Item]:
-        if not self.config.seller_black_list:
-            return ads
-        try:
-            return [ad for ad in ads if not ad.sellerId or ad.sellerId not in self.config.seller_black_list]
-        except Exception as err:
-            logger.debug(f"Ошибка при отсеивании объявления с продавцами из черного списка : {err}")
+        logger.info(f"Начинаю парсинг просмотров: {len(pending)} карточек, из кэша {len(ads) - len(pending)}")
+        if not pending:
             return ads
 
-    def _filter_by_recent_time(self, ads: list[Item]) -> list[Item]:
-        if not self.config.max_age:
-            return ads
-        try:
-            return [ad for ad in ads if
-                    self._is_recent(timestamp_ms=ad.sortTimeStamp, max_age_seconds=self.config.max_age)]
-        except Exception as err:
-            logger.debug(f"Ошибка при отсеивании слишком старых объявлений: {err}")
-            return ads
+        # Cookies и user-agent подхватываем один раз до запуска потоков, дальше они только читаются
+        self._sync_cookies()
+        limiter = RateLimiter(self.config.views_rate)
+        workers = max(1, min(self.config.views_concurrency, len(pending)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="avito-views") as executor:
+            list(executor.map(lambda ad: self._fetch_views(ad, limiter), pending))
 
-    def _filter_by_reserve(self, ads: list[Item]) -> list[Item]:
-        if not self.config.ignore_reserv:
-            return ads
-        try:
-            return [ad for ad in ads if not ad.isReserved]
-        except Exception as err:
-            logger.debug(f"Ошибка при отсеивании объявлений в резерве: {err}")
-            return ads
+        return ads
 
-    def _filter_by_promotion(self, ads: list[Item]) -> list[Item]:
-        ads = self._add_promotion_to_ads(ads=ads)
-        if not self.config.ignore_promotion:
-            return ads
+    def _fetch_views(self, ad: Item, limiter: RateLimiter) -> None:
         try:
-            return [ad for ad in ads if not ad.isPromotion]
+            html_code_full_page = self._fetch_views_page(
+                url=f"https://www.avito.ru{ad.urlPath}", limiter=limiter, retries=self.config.max_count_of_retry
+            )
+            if not html_code_full_page:
+                return
+            ad.total_views, ad.today_views = self._extract_views(html=html_code_full_page)
+            if isinstance(ad.id, int):
+                views_cache.put(ad.id, (ad.total_views, ad.today_views))
         except Exception as err:
-            logger.debug(f"Ошибка при отсеивании продвинутых объявлений: {err}")
-            return ads
+            logger.warning(f"Ошибка при парсинге {ad.urlPath}: {err}")
 
-    def parse_views(self, ads: list[Item]) -> list[Item]:
-        if not self.config.parse_views:
-            return ads
+    def _fetch_views_page(self, url: str, limiter: RateLimiter, retries: int = 3) -> str | None:
+        """
+        Загружает карточку объявления из потока просмотров
 
-        logger.info("Начинаю парсинг просмотров")
+        В отличие от fetch_data берёт сессию из пула сессий просмотров и свою
+        аренду прокси и не трогает общее состояние парсера: сессия, на которую
+        пришёл бан, закрывается вместо возврата в пул, cookies только читаются.
+        """
+        for attempt in range(1, retries + 1):
+            if self.stop_event and self.stop_event.is_set():
+                return None
+            limiter.wait()
+            try:
+                session = self._views_sessions.get_nowait()
+            except queue.Empty:
+                session = requests.Session()
 
-        for ad in ads:
+            proxy = self.proxy_manager.acquire()
+            proxy_data = {"http": proxy.url, "https": proxy.url} if proxy else None
+            started_at = time.monotonic()
             try:
-                html_code_full_page = self.fetch_data(url=f"https://www.avito.ru{ad.urlPath}")
-                ad.total_views, ad.today_views = self._extract_views(html=html_code_full_page)
-                delay = random.uniform(0.1, 0.9)
-                time.sleep(delay)
-            except Exception as err:
-                logger.warning(f"Ошибка при парсинге {ad.urlPath}: {err}")
-                continue
+                response = session.get(
+                    url=url,
+                    headers=self.headers,
+                    proxies=proxy_data,
+                    cookies=self.cookies,
+                    impersonate="chrome",
+                    timeout=60 if proxy else 20,
+                    verify=False,
+                    http_version=3,
+                )
+                if response.status_code == 429:
+                    self.proxy_manager.report_ban(proxy)
+                    session.close()  # Сессия, на которую пришёл бан
+                    session = None
+                elif response.status_code in [403, 302]:
+                    self.proxy_manager.report_failure(proxy)
+                    self.cookie_service.request_refresh()
+                elif response.status_code < 500:
+                    self.proxy_manager.report_success(proxy, latency=time.monotonic() - started_at)
+                    with self._counters_lock:
+                        self.good_request_count += 1
+                    return response.text
+                else:
+                    self.proxy_manager.report_failure(proxy)
+                logger.debug(f"Просмотры {url}, попытка {attempt}: {response.status_code}")
+                with self._counters_lock:
+                    self.bad_request_count += 1
+            except requests.RequestsError as e:
+                logger.debug(f"Просмотры {url}, попытка {attempt} закончилась неуспешно: {e}")
+                self.proxy_manager.report_failure(proxy)
+            finally:
+                self.proxy_manager.release(proxy)
+                if session is not None:
+                    self._views_sessions.put(session)
+        return None
 
-        return ads
+    def close(self) -> None:
+        """Закрывает сессию парсера и прогретые сессии просмотров"""
+        self.session.close()
+        while True:
+            try:
+                self._views_sessions.get_nowait().close()
+            except queue.Empty:
+                break
 
     @staticmethod
     def _extract_views(html: str) -> tuple:
-        soup = BeautifulSoup(html, "html.parser")
-
-        def extract_digits(element):
-            return int(''.join(filter(str.isdigit, element.get_text()))) if element else None
-
-        total = extract_digits(soup.select_one('[data-marker="item-view/total-views"]'))
-        today = extract_digits(soup.select_one('[data-marker="item-view/today-views"]'))
-
-        return total, today
-
-    def get_current_ip(self) -> str | None:
-        """Получить текущий IP адрес через прокси"""
-        try:
-            if self.proxy_obj:
-                proxy_url = f"http://{self.config.proxy_string}"
-                proxy_data = {"http": proxy_url, "https": proxy_url}
-                response = requests.get(
-                    "https://api.ipify.org?format=text",
-                    proxies=proxy_data,
-                    timeout=10,
-                    verify=False
-                )
-                if response.status_code == 200:
-                    return response.text.strip()
-            else:
-                # Без прокси
-                response = requests.get(
-                    "https://api.ipify.org?format=text",
-                    timeout=10,
-                    verify=False
-                )
-                if response.status_code == 200:
-                    return response.text.strip()
-        except Exception as err:
-            logger.warning(f"Не удалось получить текущий IP: {err}")
-        return None
+        return extract_views(html)
 
     def change_ip(self) -> bool:
-        """Смена IP с использованием списка ссылок"""
-        # Получаем список ссылок для смены IP
-        change_urls = []
-        if self.config.proxy_change_urls:  # Приоритет - список ссылок
-            change_urls = self.config.proxy_change_urls
-        elif self.config.proxy_change_url:  # Fallback - одна ссылка
-            change_urls = [self.config.proxy_change_url]
-        else:
+        """Запускает фоновую смену IP для прокси последнего запроса"""
+        if not self.current_proxy:
             logger.info("Сейчас бы была смена ip, но мы без прокси")
             return False
-        
-        # Получаем текущий IP перед сменой
-        old_ip = self.get_current_ip()
-        if old_ip:
-            logger.info(f"Текущий IP: {old_ip}")
-        
-        # Пытаемся сменить IP с помощью текущей ссылки
-        current_url = change_urls[self.current_url_index % len(change_urls)]
-        logger.info(f"Меняю IP используя ссылку {self.current_url_index + 1}/{len(change_urls)}")
-        
-        try:
-            res = requests.get(url=current_url, verify=False, timeout=10)
-            if res.status_code == 200:
-                # Проверяем, изменился ли IP
-                time.sleep(2)  # Небольшая пауза для применения смены IP
-                new_ip = self.get_current_ip()
-                
-                if new_ip and new_ip != old_ip:
-                    logger.info(f"IP успешно изменен: {old_ip} -> {new_ip}")
-                    self.current_ip = new_ip
-                    # Сбрасываем индекс на первую ссылку, так как смена прошла успешно
-                    self.current_url_index = 0
-                    return True
-                elif new_ip == old_ip:
-                    logger.warning(f"IP не изменился ({old_ip}), пробую следующую ссылку")
-                    # Увеличиваем индекс для использования следующей ссылки
-                    self.current_url_index += 1
-                    # Если прошли все ссылки, начинаем сначала
-                    if self.current_url_index >= len(change_urls):
-                        self.current_url_index = 0
-                    # Пробуем снова с следующей ссылкой
-                    time.sleep(random.randint(2, 5))
-                    return self.change_ip()
-                else:
-                    logger.warning("Не удалось получить новый IP после смены")
-                    return False
-        except Exception as err:
-            logger.warning(f"При смене ip возникла ошибка: {err}")
-        
-        # Если не удалось, пробуем снова с той же или следующей ссылкой
-        logger.info("Не удалось изменить IP, пробую еще раз")
-        self.current_url_index = (self.current_url_index + 1) % len(change_urls)
-        time.sleep(random.randint(3, 10))
-        return self.change_ip()
+        return self.proxy_manager.rotate(self.current_proxy)
 
     @staticmethod
     def _extract_seller_slug(data):
-        match = re.search(r"/brands/([^/?#]+)", str(data))
-        if match:
-            return match.group(1)
+        """Ищет slug продавца в ссылке профиля и в payload шагов IVA"""
+        user_logo = getattr(data, "userLogo", None)
+        if user_logo and user_logo.link:
+            match = SELLER_SLUG_RE.search(user_logo.link)
+            if match:
+                return match.group(1)
+
+        for steps in (getattr(data, "iva", None) or {}).values():
+            for step in steps:
+                component_data = getattr(step, "componentData", None)
+                for payload in (step.payload, getattr(component_data, "payload", None)):
+                    if slug := AvitoParse._find_seller_slug_in_payload(payload):
+                        return slug
         return None
 
     @staticmethod
-    def _is_phrase_in_ads(ad: Item, phrases: list) -> bool:
-        full_text_from_ad = (ad.title + ad.description).lower()
-        return any(phrase.lower() in full_text_from_ad for phrase in phrases)
+    def _find_seller_slug_in_payload(payload) -> str | None:
+        """Обходит вложенный payload и ищет ссылку вида /brands/<slug>"""
+        stack = [payload]
+        while stack:
+            value = stack.pop()
+            if isinstance(value, str):
+                if "/brands/" in value:
+                    match = SELLER_SLUG_RE.search(value)
+                    if match:
+                        return match.group(1)
+            elif isinstance(value, dict):
+                stack.extend(value.values())
+            elif isinstance(value, list):
+                stack.extend(value)
+        return None
 
     # Удалена логика проверки просмотренных объявлений
 
-    @staticmethod
-    def _is_recent(timestamp_ms: int, max_age_seconds: int) -> bool:
-        now = datetime.utcnow()
-        published_time = datetime.utcfromtimestamp(timestamp_ms / 1000)
-        return (now - published_time) <= timedelta(seconds=max_age_seconds)
-
     # Удалено сохранение данных в БД
 
     def get_next_page_url(self, url: str):
@@ -513,10 +482,17 @@ if __name__ == "__main__":
         logger.error(f"Ошибка загрузки конфига: {err}")
         exit(1)
 
+    # Один сервис cookies на все перезапуски парсера, cookies переживают рестарт в файле
+    proxy_manager = ProxyManager.from_config(config)
+    cookie_service = CookieService(store=CookieStore(path="cookies.json"), proxy=AvitoParse.proxy_for_cookies(config))
+
     while True:
         try:
-            parser = AvitoParse(config)
-            parser.parse()
+            parser = AvitoParse(config, proxy_manager=proxy_manager, cookie_service=cookie_service)
+            try:
+                parser.parse()
+            finally:
+                parser.close()
             if config.one_time_start:
                 logger.info("Парсинг завершен т.к. включён one_time_start в настройках")
                 break
@@ -0,0 +1,100 @@
+"""
+Пул долгоживущих экземпляров AvitoParse для API
+
+Каждый воркер держит свою curl_cffi сессию (прогретое TLS/HTTP3 соединение).
+Cookies воркеры берут из общего хранилища фонового CookieService. Прокси выдаёт общий для всех воркеров ProxyManager - самый
+здоровый на каждый запрос. На время запроса воркер забирается из пула,
+получает конфигурацию с параметрами запроса и возвращается обратно.
+"""
+import queue
+from contextlib import contextmanager
+from dataclasses import replace
+from typing import Iterator, List, Optional
+
+from loguru import logger
+
+from src.cookie_store import CookieService, CookieStore
+from src.dto import AvitoConfig
+from src.parser_cls import AvitoParse
+from src.proxy_manager import ProxyManager
+
+
+class ParserPool:
+    def __init__(
+            self,
+            base_config: AvitoConfig,
+            size: int,
+            proxy_manager: Optional[ProxyManager] = None,
+            cookie_service: Optional[CookieService] = None,
+    ):
+        self.base_config = base_config
+        self.size = size
+        self.proxy_manager = proxy_manager or ProxyManager.from_config(base_config)
+        # Cookies в памяти процесса, общие для всех воркеров
+        self.cookie_service = cookie_service or CookieService(
+            store=CookieStore(), proxy=AvitoParse.proxy_for_cookies(base_config)
+        )
+        self._idle: queue.Queue[AvitoParse] = queue.Queue()
+        self._workers: List[AvitoParse] = []
+
+        for _ in range(size):
+            parser = AvitoParse(config=base_config, proxy_manager=self.proxy_manager, cookie_service=self.cookie_service)
+            self._workers.append(parser)
+            self._idle.put(parser)
+
+        logger.info(f"Пул парсеров создан: {size} воркеров, прокси: {len(self.proxy_manager.proxies)}")
+
+    @contextmanager
+    def checkout(self, timeout: Optional[float] = None, **overrides) -> Iterator[AvitoParse]:
+        """
+        Забирает свободный парсер на время запроса
+
+        overrides - поля AvitoConfig, специфичные для запроса (urls, min_price, ...).
+        """
+        parser = self._idle.get(timeout=timeout)
+        worker_config = parser.config
+        try:
+            parser.config = replace(worker_config, **overrides)
+            yield parser
+        finally:
+            parser.config = worker_config
+            self._idle.put(parser)
+
+    @contextmanager
+    def borrow_idle(self, limit: int) -> Iterator[List[AvitoParse]]:
+        """
+        Забирает до limit свободных парсеров без ожидания
+
+        Для параллельной загрузки страниц одного поиска: берём только то, что
+        свободно сейчас, поэтому запросы не ждут друг друга и не блокируют пул.
+        """
+        borrowed: List[AvitoParse] = []
+        try:
+            while len(borrowed) < limit:
+                try:
+                    borrowed.append(self._idle.get_nowait())
+                except queue.Empty:
+                    break
+            yield borrowed
+        finally:
+            for parser in borrowed:
+                self._idle.put(parser)
+
+    def close(self) -> None:
+        """Закрывает сессии всех воркеров (при остановке API)"""
+        for parser in self._workers:
+            parser.close()
+
+    @property
+    def idle_count(self) -> int:
+        return self._idle.qsize()
+
+    def stats(self) -> dict:
+        return {
+            "size": self.size,
+            "idle": self.idle_count,
+            "good_requests": sum(parser.good_request_count for parser in self._workers),
+            "bad_requests": sum(parser.bad_request_count for parser in self._workers),
+            "proxies": self.proxy_manager.stats(),
+            "cookies": self.cookie_service.stats(),
+        }
@@ -0,0 +1,211 @@
+"""
+Менеджер прокси с фоновой сменой IP и оценкой здоровья
+
+Держит несколько прокси и ссылки смены IP для них, считает по каждому
+успехи, ошибки, баны и среднюю задержку, и на каждый запрос выдаёт самый
+здоровый прокси (занятые текущими запросами получают штраф, поэтому
+параллельные запросы расходятся по разным прокси). Смена IP выполняется в фоне, поэтому запросы через
+остальные прокси продолжают идти, пока один из них меняет IP.
+"""
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+from curl_cffi import requests
+from loguru import logger
+
+from src.dto import AvitoConfig
+
+IP_CHECK_URL = "https://api.ipify.org?format=text"
+LATENCY_SMOOTHING = 0.3  # Вес нового замера в скользящей средней задержки
+BAN_PENALTY = 0.25  # Штраф к оценке за каждый бан с момента последней смены IP
+LATENCY_PENALTY_PER_SECOND = 0.02
+BUSY_PENALTY = 0.3  # Штраф к оценке за каждый незавершённый запрос через прокси
+
+
+@dataclass
+class ProxyState:
+    proxy_string: str
+    change_urls: List[str] = field(default_factory=list)
+    successes: int = 0
+    failures: int = 0
+    bans: int = 0  # Баны с момента последней успешной смены IP
+    latency: float = 0.0  # Скользящая средняя задержки ответа, секунды
+    rotating: bool = False
+    current_ip: Optional[str] = None
+    change_url_index: int = 0
+    last_used: float = 0.0
+    in_flight: int = 0  # Запросы, идущие через прокси прямо сейчас
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.proxy_string}"
+
+    @property
+    def host(self) -> str:
+        """Адрес прокси без логина и пароля (для логов)"""
+        return self.proxy_string.split("@")[-1]
+
+    @property
+    def score(self) -> float:
+        success_rate = (self.successes + 1) / (self.successes + self.failures + 2)
+        return success_rate - BAN_PENALTY * self.bans - LATENCY_PENALTY_PER_SECOND * self.latency
+
+
+class ProxyManager:
+    def __init__(self, proxy_strings: List[str], change_urls: List[str], max_rotate_attempts: int = 6):
+        self.max_rotate_attempts = max_rotate_attempts
+        self._lock = threading.Lock()
+        self._rotation_done = threading.Condition(self._lock)  # Какой-то прокси закончил смену IP
+        # Если ссылок смены IP ровно по одной на прокси - связываем попарно,
+        # иначе все ссылки относятся к каждому прокси (как для одного прокси раньше)
+        paired = len(proxy_strings) > 1 and len(change_urls) == len(proxy_strings)
+        self.proxies = [
+            ProxyState(proxy_string=proxy, change_urls=[change_urls[index]] if paired else list(change_urls))
+            for index, proxy in enumerate(proxy_strings)
+        ]
+        self._executor = ThreadPoolExecutor(max_workers=max(1, len(self.proxies)), thread_name_prefix="proxy-rotate")
+
+        if self.proxies:
+            logger.info(f"Менеджер прокси: {len(self.proxies)} прокси, {len(change_urls)} ссылок смены IP")
+        else:
+            logger.info("Работаем без прокси")
+
+    @classmethod
+    def from_config(cls, config: AvitoConfig) -> "ProxyManager":
+        proxy_strings = list(config.proxy_strings) or ([config.proxy_string] if config.proxy_string else [])
+        change_urls = list(config.proxy_change_urls) or ([config.proxy_change_url] if config.proxy_change_url else [])
+        return cls(proxy_strings=proxy_strings, change_urls=change_urls)
+
+    def acquire(self) -> Optional[ProxyState]:
+        """
+        Самый здоровый прокси из тех, что не меняют IP
+
+        Если IP меняют все прокси (с одним прокси - при каждой смене), ждёт окончания
+        смены: запрос через прокси посреди смены IP всё равно бы не прошёл.
+        None - только если прокси не настроены.
+        """
+        with self._lock:
+            if not self.proxies:
+                return None
+            while not (candidates := [proxy for proxy in self.proxies if not proxy.rotating]):
+                self._rotation_done.wait()
+            # Занятые прокси штрафуем; при равной оценке берём тот, что дольше не использовался
+            proxy = max(candidates, key=lambda p: (p.score - BUSY_PENALTY * p.in_flight, -p.last_used))
+            proxy.last_used = time.monotonic()
+            proxy.in_flight += 1
+            return proxy
+
+    def release(self, proxy: Optional[ProxyState]) -> None:
+        """Запрос через прокси, выданный acquire, завершён"""
+        if not proxy:
+            return
+        with self._lock:
+            proxy.in_flight = max(0, proxy.in_flight - 1)
+
+    def report_success(self, proxy: Optional[ProxyState], latency: float) -> None:
+        if not proxy:
+            return
+        with self._lock:
+            proxy.successes += 1
+            proxy.bans = 0  # Прокси снова отвечает - бан снят
+            proxy.latency = latency if not proxy.latency else (
+                LATENCY_SMOOTHING * latency + (1 - LATENCY_SMOOTHING) * proxy.latency
+            )
+
+    def report_failure(self, proxy: Optional[ProxyState], rotate: bool = False) -> None:
+        """Ошибка сети/прокси; при rotate=True прокси отправляется на смену IP"""
+        if not proxy:
+            return
+        with self._lock:
+            proxy.failures += 1
+        if rotate:
+            self.rotate(proxy)
+
+    def report_ban(self, proxy: Optional[ProxyState]) -> None:
+        """Авито ограничил запросы (429) - штрафуем прокси и меняем ему IP в фоне"""
+        if not proxy:
+            logger.info("Сейчас бы была смена ip, но мы без прокси")
+            return
+        with self._lock:
+            proxy.failures += 1
+            proxy.bans += 1
+        self.rotate(proxy)
+
+    def rotate(self, proxy: ProxyState) -> bool:
+        """Запускает смену IP в фоне; возвращает False, если смена уже идёт или невозможна"""
+        with self._lock:
+            if proxy.rotating or not proxy.change_urls:
+                return False
+            proxy.rotating = True
+        self._executor.submit(self._rotate, proxy)
+        return True
+
+    def _rotate(self, proxy: ProxyState) -> None:
+        """Смена IP с перебором ссылок; число попыток ограничено, без рекурсии"""
+        try:
+            old_ip = self.get_current_ip(proxy)
+            for attempt in range(1, self.max_rotate_attempts + 1):
+                with self._lock:
+                    change_url = proxy.change_urls[proxy.change_url_index % len(proxy.change_urls)]
+                logger.info(f"[{proxy.host}] Меняю IP, попытка {attempt}/{self.max_rotate_attempts}")
+                try:
+                    res = requests.get(url=change_url, verify=False, timeout=10)
+                    if res.status_code == 200:
+                        time.sleep(2)  # Небольшая пауза для применения смены IP
+                        new_ip = self.get_current_ip(proxy)
+                        if new_ip and new_ip != old_ip:
+                            logger.info(f"[{proxy.host}] IP успешно изменен: {old_ip} -> {new_ip}")
+                            with self._lock:
+                                proxy.current_ip = new_ip
+                                proxy.bans = 0
+                                proxy.change_url_index = 0
+                            return
+                        logger.warning(f"[{proxy.host}] IP не изменился ({old_ip}), пробую следующую ссылку")
+                except Exception as err:
+                    logger.warning(f"[{proxy.host}] При смене ip возникла ошибка: {err}")
+
+                with self._lock:
+                    proxy.change_url_index += 1
+                time.sleep(random.randint(2, 5))
+
+            logger.error(f"[{proxy.host}] Не удалось сменить IP за {self.max_rotate_attempts} попыток")
+        finally:
+            with self._lock:
+                proxy.rotating = False
+                self._rotation_done.notify_all()
+
+    @staticmethod
+    def get_current_ip(proxy: Optional[ProxyState]) -> str | None:
+        """Получить текущий IP адрес через прокси"""
+        try:
+            proxies = {"http": proxy.url, "https": proxy.url} if proxy else None
+            response = requests.get(IP_CHECK_URL, proxies=proxies, timeout=10, verify=False)
+            if response.status_code == 200:
+                return response.text.strip()
+        except Exception as err:
+            logger.warning(f"Не удалось получить текущий IP: {err}")
+        return None
+
+    def stats(self) -> List[dict]:
+        with self._lock:
+            return [
+                {
+                    "proxy": proxy.host,
+                    "score": round(proxy.score, 3),
+                    "successes": proxy.successes,
+                    "failures": proxy.failures,
+                    "bans": proxy.bans,
+                    "latency": round(proxy.latency, 3),
+                    "rotating": proxy.rotating,
+                    "in_flight": proxy.in_flight,
+                    "current_ip": proxy.current_ip,
+                }
+                for proxy in self.proxies
+            ]
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,114 @@
+"""
+Просмотры объявлений: быстрое извлечение счётчиков, кэш и ограничитель скорости
+
+Счётчики просмотров стоят в карточке объявления в элементах
+data-marker="item-view/total-views" и "item-view/today-views". Их достаёт
+регулярка по тексту страницы, без разбора всего DOM (BeautifulSoup остаётся
+запасным путём). Просмотры меняются медленно, поэтому хранятся в кэше по ID
+объявления и не запрашиваются заново каждый цикл (срок годности задаёт вызывающий).
+"""
+import html as html_lib
+import random
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from bs4 import BeautifulSoup
+
+Views = Tuple[Optional[int], Optional[int]]  # (всего, сегодня)
+
+DEFAULT_CACHE_MAX_ENTRIES = 50000
+
+# Текст первого текстового узла внутри элемента-счётчика (возможно, вложенного в теги)
+VIEW_COUNTER_RE = re.compile(
+    r"""data-marker=["']item-view/(total|today)-views["'][^>]*>(?:\s*<[a-zA-Z][^>]*>)*([^<]*)"""
+)
+
+
+def _digits(text: Optional[str]) -> Optional[int]:
+    digits = "".join(filter(str.isdigit, text or ""))
+    return int(digits) if digits else None
+
+
+def extract_views(html: str) -> Views:
+    """Счётчики просмотров (всего, сегодня) со страницы объявления"""
+    found: Dict[str, Optional[int]] = {}
+    for match in VIEW_COUNTER_RE.finditer(html):
+        # Сущности вроде &#160; между разрядами содержат цифры - раскрываем их до подсчёта
+        found.setdefault(match.group(1), _digits(html_lib.unescape(match.group(2))))
+    if found:
+        return found.get("total"), found.get("today")
+    return extract_views_with_soup(html)
+
+
+def extract_views_with_soup(html: str) -> Views:
+    """Запасной путь: полноценный разбор страницы"""
+    soup = BeautifulSoup(html, "html.parser")
+
+    def extract_digits(element):
+        return _digits(element.get_text()) if element else None
+
+    total = extract_digits(soup.select_one('[data-marker="item-view/total-views"]'))
+    today = extract_digits(soup.select_one('[data-marker="item-view/today-views"]'))
+
+    return total, today
+
+
+class ViewsCache:
+    """Потокобезопасный LRU/TTL кэш просмотров по ID объявления"""
+
+    def __init__(self, max_entries: int = DEFAULT_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[int, Tuple[float, Views]]" = OrderedDict()  # ID -> (момент загрузки, просмотры)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, ad_id: int, ttl: float) -> Optional[Views]:
+        """Просмотры, загруженные не раньше чем ttl секунд назад"""
+        with self._lock:
+            entry = self._entries.get(ad_id)
+            if entry and time.monotonic() - entry[0] < ttl:
+                self._entries.move_to_end(ad_id)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            return None
+
+    def put(self, ad_id: int, views: Views) -> None:
+        with self._lock:
+            self._entries[ad_id] = (time.monotonic(), views)
+            self._entries.move_to_end(ad_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"size": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+class RateLimiter:
+    """Не больше rate запросов в секунду на все потоки, с небольшим случайным разбросом"""
+
+    def __init__(self, rate: float):
+        self.interval = 1 / rate if rate > 0 else 0.0
+        self._lock = threading.Lock()
+        self._next_at = 0.0
+
+    def wait(self) -> None:
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_at)
+            # Разброс вместо фиксированного шага, чтобы запросы не шли строго по таймеру
+            self._next_at = slot + self.interval * random.uniform(0.5, 1.5)
+        delay = slot - now
+        if delay > 0:
+            time.sleep(delay)
+
+
+# Общий кэш просмотров: переживает пересоздание AvitoParse между циклами
+views_cache = ViewsCache()
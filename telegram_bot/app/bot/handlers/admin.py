@@ -12,8 +12,10 @@ from decimal import Decimal
 from datetime import datetime
 from ...db.model import AsyncSessionLocal, User, SubscriptionPlan, Promocode
 from ...db import get_monthly_statistics, get_popular_subscription_plans, get_daily_activity_stats
-from ...db import get_all_users, get_users_with_active_subscription, get_users_without_active_subscription, get_notification_stats
+from ...db import get_notification_stats
 from .base import get_main_keyboard
+from ...services.broadcast_service import get_broadcast_service, TARGET_NAMES
+from ...services.tracking_service import get_tracking_service
 
 router = Router()
 
@@ -159,7 +161,7 @@ def get_statistics_keyboard():
     keyboard = ReplyKeyboardMarkup(
         keyboard=[
             [KeyboardButton(text="📈 Общая статистика"), KeyboardButton(text="📊 Популярные планы")],
-            [KeyboardButton(text="📅 Дневная активность")],
+            [KeyboardButton(text="📅 Дневная активность"), KeyboardButton(text="⚙️ Отслеживание")],
             [KeyboardButton(text="◀️ Назад к админке")]
         ],
         resize_keyboard=True
@@ -731,6 +733,40 @@ async def admin_daily_activity(message: types.Message):
         await message.answer(f"❌ Ошибка при получении дневной статистики: {str(e)}")
 
 
+@router.message(F.text == "⚙️ Отслеживание")
+async def admin_tracking_metrics(message: types.Message):
+    if not await _is_admin(str(message.from_user.id)):
+        await message.answer("⛔ Доступ запрещён")
+        return
+    
+    tracking_service = get_tracking_service()
+    if not tracking_service:
+        await message.answer("❌ Сервис отслеживания не запущен")
+        return
+    
+    metrics = tracking_service.get_metrics()
+    cache = metrics['seen_cache']
+    notifications = metrics['notifications']
+    metrics_text = (
+        f"⚙️ <b>Циклы отслеживания</b>\n"
+        f"├ Всего циклов: {metrics['cycles_total']}\n"
+        f"├ Превышений дедлайна: {metrics['deadline_exceeded_total']}\n"
+        f"├ Последний цикл: {metrics['last_cycle_duration']:.1f}с\n"
+        f"├ Поисков: {metrics['last_cycle_searches']} (запущено {metrics['last_cycle_started']}, "
+        f"пропущено {metrics['last_cycle_skipped']})\n"
+        f"└ В работе сейчас: {metrics['backlog']}\n\n"
+        f"🗂 <b>Кэш просмотренных объявлений</b>\n"
+        f"├ Размер: {cache['size']}/{cache['max_entries']}\n"
+        f"├ Попаданий: {cache['hits']}, промахов: {cache['misses']} ({cache['hit_rate'] * 100:.1f}%)\n"
+        f"└ Вытеснено: {cache['evictions']}\n\n"
+        f"📨 <b>Очередь уведомлений</b>\n"
+        f"├ Отправлено: {notifications['sent']}, ошибок: {notifications['failed']}\n"
+        f"├ Повторов: {notifications['retried']}, flood control: {notifications['retry_after']}\n"
+        f"└ В очереди: {notifications['queued']} (+{notifications['delayed']} отложено)"
+    )
+    await message.answer(metrics_text, parse_mode="HTML")
+
+
 # =================== УВЕДОМЛЕНИЯ ===================
 
 @router.message(F.text == "👥 Всем пользователям")
@@ -857,27 +893,26 @@ async def cancel_notification(message: types.Message):
     )
 
 async def send_notification_to_users(message: types.Message, admin_id: str):
-    """Отправляет уведомление выбранной группе пользователей"""
+    """Запускает фоновую рассылку уведомления выбранной группе пользователей"""
     try:
         state = notification_state[admin_id]
         target = state["target"]
         text = state["message"]
         
-        # Получаем список пользователей
-        if target == "all":
-            users = await get_all_users()
-            target_name = "всем пользователям"
-        elif target == "active":
-            users = await get_users_with_active_subscription()
-            target_name = "пользователям с активной подпиской"
-        elif target == "inactive":
-            users = await get_users_without_active_subscription()
-            target_name = "пользователям без подписки"
-        else:
+        if target not in TARGET_NAMES:
             await message.answer("❌ Неизвестный тип рассылки", reply_markup=get_admin_main_keyboard())
             return
+        target_name = TARGET_NAMES[target]
+        
+        # Число получателей - только для прогресса, сами получатели читаются из БД по мере отправки
+        stats = await get_notification_stats()
+        total = {
+            "all": stats["total_users"],
+            "active": stats["with_subscription"],
+            "inactive": stats["without_subscription"],
+        }[target]
         
-        if not users:
+        if not total:
             await message.answer(f"📭 Нет пользователей для рассылки ({target_name})", reply_markup=get_admin_main_keyboard())
             notification_state.pop(admin_id, None)
             return
@@ -885,88 +920,30 @@ async def send_notification_to_users(message: types.Message, admin_id: str):
         # Показываем прогресс
         progress_msg = await message.answer(
             f"📤 <b>Начинаю рассылку {target_name}...</b>\n"
-            f"👥 Всего получателей: {len(users)}",
+            f"👥 Всего получателей: {total}",
             parse_mode="HTML"
         )
         
-        # Отправляем сообщения
-        success_count = 0
-        failed_count = 0
-        html_error_count = 0
-        bot = message.bot
-        
-        for i, user in enumerate(users, 1):
-            try:
-                # Безопасная отправка с обработкой HTML ошибок
-                success = await safe_send_message(
-                    bot,
-                    chat_id=user['telegram_id'],
-                    text=text,
-                    parse_mode="HTML"
-                )
-                
-                if success:
-                    success_count += 1
-                else:
-                    # Пробуем отправить без HTML разметки как fallback
-                    try:
-                        await bot.send_message(
-                            chat_id=user['telegram_id'],
-                            text=f"⚠️ Сообщение от администрации (без форматирования):\n\n{text}"
-                        )
-                        success_count += 1
-                        html_error_count += 1
-                    except Exception:
-                        failed_count += 1
-                
-                # Обновляем прогресс каждые 10 сообщений
-                if i % 10 == 0 or i == len(users):
-                    try:
-                        progress_text = (
-                            f"📤 <b>Рассылка в процессе...</b>\n"
-                            f"👥 Всего: {len(users)}\n"
-                            f"✅ Отправлено: {success_count}\n"
-                            f"❌ Ошибок: {failed_count}\n"
-                            f"📊 Прогресс: {i}/{len(users)}"
-                        )
-                        if html_error_count > 0:
-                            progress_text += f"\n⚠️ HTML ошибок: {html_error_count}"
-                        
-                        await progress_msg.edit_text(progress_text, parse_mode="HTML")
-                    except:
-                        pass  # Игнорируем ошибки редактирования
-                
-                # Пауза для избежания лимитов
-                await asyncio.sleep(0.05)  # 50ms между сообщениями
-                
-            except Exception as e:
-                failed_count += 1
-                print(f"Ошибка отправки пользователю {user['telegram_id']}: {e}")
-        
-        # Финальный отчет
-        final_report = (
-            f"✅ <b>Рассылка завершена!</b>\n\n"
-            f"📊 <b>Статистика:</b>\n"
-            f"├ Всего получателей: {len(users)}\n"
-            f"├ Успешно доставлено: {success_count}\n"
-            f"├ Ошибок доставки: {failed_count}"
+        broadcast = await get_broadcast_service().start_broadcast(
+            admin_id=admin_id,
+            target=target,
+            text=text,
+            total=total,
+            progress_chat_id=str(progress_msg.chat.id),
+            progress_message_id=progress_msg.message_id,
         )
         
-        if html_error_count > 0:
-            final_report += f"\n├ HTML ошибок (отправлено без форматирования): {html_error_count}"
-        
-        final_report += f"\n└ Процент успеха: {(success_count / len(users) * 100) if len(users) > 0 else 0:.1f}%"
-        
-        try:
-            await progress_msg.edit_text(final_report, parse_mode="HTML")
-        except Exception as e:
-            # Fallback без HTML если есть проблемы с разметкой
-            await progress_msg.edit_text(final_report.replace('<b>', '').replace('</b>', ''))
-        
         # Убираем состояние
         notification_state.pop(admin_id, None)
         
-        await message.answer("🏠 Возвращаемся в админ-панель", reply_markup=get_admin_main_keyboard())
+        if not broadcast:
+            await message.answer("❌ Не удалось создать рассылку", reply_markup=get_admin_main_keyboard())
+            return
+        
+        await message.answer(
+            "🏠 Рассылка идёт в фоне, прогресс обновляется в сообщении выше",
+            reply_markup=get_admin_main_keyboard()
+        )
         
     except Exception as e:
         await message.answer(f"❌ Критическая ошибка рассылки: {str(e)}", reply_markup=get_admin_main_keyboard())
@@ -7,7 +7,7 @@ from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton, LabeledPri
 from sqlalchemy import select
 from datetime import datetime, timedelta
 from ...db.model import AsyncSessionLocal, User, SubscriptionPlan, Payment, UserSubscription, Promocode, PromoUsage
-from ...db import get_user_current_promocode, clear_user_promocode
+from ...db import get_user_current_promocode, clear_user_promocode, invalidate_subscription_cache
 from .base import get_main_keyboard
 from ...config import YOOKASSA_TOKEN
 from typing import Dict, Set
@@ -360,6 +360,7 @@ async def process_successful_payment(message: types.Message):
                     await clear_user_promocode(str(message.from_user.id))
             
             await session.commit()
+            invalidate_subscription_cache(str(message.from_user.id))
             
             # Удаляем сообщение с планами подписки
             try:
@@ -5,6 +5,7 @@ import re
 from aiogram import Router, types
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from app.db import user_has_active_subscription, add_tracking, archive_tracking, restore_tracking, delete_tracking, get_user_trackings
+from app.db import set_tracking_delivery_mode, DELIVERY_AUTO, DELIVERY_INSTANT, DELIVERY_DIGEST, DELIVERY_MODES
 
 router = Router()
 
@@ -13,6 +14,13 @@ print("🔍 TRACKING MODULE: Модуль tracking.py загружен")
 # Состояния для добавления отслеживания
 tracking_states = {}  
 
+# Подписи режимов доставки уведомлений
+DELIVERY_MODE_TITLES = {
+    DELIVERY_AUTO: "🤖 Авто (много объявлений - сводкой)",
+    DELIVERY_INSTANT: "⚡ Каждое объявление отдельно",
+    DELIVERY_DIGEST: "📰 Всегда сводкой",
+}
+
 
 @router.message(lambda message: message.text and "avito.ru" in message.text.lower())
 async def handle_add_tracking_link(message: types.Message):
@@ -237,6 +245,13 @@ async def handle_tracking_number(message: types.Message):
         else:
             keyboard_buttons.append([InlineKeyboardButton(text="🔄 Восстановить", callback_data=f"restore_track:{selected_tracking.id}")])
         
+        # Кнопка переключает режим доставки по кругу
+        delivery_mode = selected_tracking.delivery_mode or DELIVERY_AUTO
+        next_mode = DELIVERY_MODES[(DELIVERY_MODES.index(delivery_mode) + 1) % len(DELIVERY_MODES)]
+        keyboard_buttons.append([InlineKeyboardButton(
+            text=f"📬 Доставка: {DELIVERY_MODE_TITLES[next_mode]}",
+            callback_data=f"delivery_track:{selected_tracking.id}:{next_mode}"
+        )])
         keyboard_buttons.append([InlineKeyboardButton(text="🗑️ Удалить", callback_data=f"delete_track:{selected_tracking.id}")])
         keyboard_buttons.append([InlineKeyboardButton(text="❌ Отмена", callback_data="cancel_track_action")])
         
@@ -254,6 +269,7 @@ async def handle_tracking_number(message: types.Message):
         elif selected_tracking.max_price:
             msg += f"💰 <b>Цена до:</b> {selected_tracking.max_price} ₽\n"
         
+        msg += f"📬 <b>Доставка:</b> {DELIVERY_MODE_TITLES.get(delivery_mode, delivery_mode)}\n"
         msg += f"📎 <b>Ссылка:</b> {selected_tracking.link[:50]}{'...' if len(selected_tracking.link) > 50 else ''}\n\n"
         msg += "Выберите действие:"
         
@@ -316,6 +332,31 @@ async def callback_restore_track(callback: types.CallbackQuery):
         await callback.answer()
 
 
+@router.callback_query(lambda callback: callback.data.startswith("delivery_track:"))
+async def callback_delivery_track(callback: types.CallbackQuery):
+    """Callback обработчик смены режима доставки уведомлений"""
+    _, tracking_id, mode = callback.data.split(":", 2)
+    
+    try:
+        success = await set_tracking_delivery_mode(
+            telegram_id=str(callback.from_user.id),
+            tracking_id=tracking_id,
+            mode=mode
+        )
+        
+        if success:
+            await callback.message.edit_text(f"📬 ✅ Режим доставки: {DELIVERY_MODE_TITLES[mode]}")
+        else:
+            await callback.message.edit_text("❌ Отслеживание не найдено.")
+            
+        await callback.answer()
+        
+    except Exception as e:
+        print(f"Ошибка при смене режима доставки: {e}")
+        await callback.message.edit_text("❌ Ошибка при смене режима доставки.")
+        await callback.answer()
+
+
 @router.callback_query(lambda callback: callback.data.startswith("delete_track:"))
 async def callback_delete_track(callback: types.CallbackQuery):
     """Callback обработчик удаления отслеживания"""
@@ -15,4 +15,40 @@ API_TOKEN = os.getenv('API_TOKEN')
 
 # API парсинга
 PARSER_API_URL = os.getenv('PARSER_API_URL')
-PARSER_API_TOKEN = os.getenv('PARSER_API_TOKEN')
\ No newline at end of file
+PARSER_API_TOKEN = os.getenv('PARSER_API_TOKEN')
+
+# Цикл отслеживания
+TRACKING_INTERVAL = int(os.getenv('TRACKING_INTERVAL', '60'))  # Период запуска цикла, секунды
+TRACKING_CONCURRENCY = int(os.getenv('TRACKING_CONCURRENCY', '10'))  # Одновременных запросов к парсеру
+TRACKING_CYCLE_DEADLINE = int(os.getenv('TRACKING_CYCLE_DEADLINE', '55'))  # Сколько цикл ждёт поиски, секунды
+TRACKING_BATCH_SIZE = int(os.getenv('TRACKING_BATCH_SIZE', '50'))  # Поисков в одном запросе /parse/batch (0 - по одному)
+TRACKING_PAGES = int(os.getenv('TRACKING_PAGES', '1'))  # Сколько страниц каждого поиска просматривать
+TRACKING_USE_CURSOR = os.getenv('TRACKING_USE_CURSOR', 'true').lower() == 'true'  # Запрашивать только новые объявления
+TRACKING_FULL_SCAN_EVERY = int(os.getenv('TRACKING_FULL_SCAN_EVERY', '10'))  # Каждый N-й запрос поиска без курсора (0 - никогда)
+
+# Кэш просмотренных объявлений
+SEEN_CACHE_MAX_ENTRIES = int(os.getenv('SEEN_CACHE_MAX_ENTRIES', '200000'))  # Ключей на все отслеживания
+SEEN_CACHE_TTL = int(os.getenv('SEEN_CACHE_TTL', '86400'))  # Время жизни ключа, секунды
+
+# Хранение просмотренных объявлений (таблица items)
+ITEMS_RETENTION_DAYS = int(os.getenv('ITEMS_RETENTION_DAYS', '30'))  # 0 - не удалять
+
+# Очередь уведомлений
+NOTIFY_GLOBAL_RATE = float(os.getenv('NOTIFY_GLOBAL_RATE', '30'))  # Сообщений в секунду на бота
+NOTIFY_CHAT_RATE = float(os.getenv('NOTIFY_CHAT_RATE', '1'))  # Сообщений в секунду в один чат
+NOTIFY_WORKERS = int(os.getenv('NOTIFY_WORKERS', '8'))  # Параллельных отправщиков
+NOTIFY_MAX_RETRIES = int(os.getenv('NOTIFY_MAX_RETRIES', '3'))  # Повторов при временной ошибке
+
+# Сводки новых объявлений
+DIGEST_THRESHOLD = int(os.getenv('DIGEST_THRESHOLD', '3'))  # В режиме auto сводка, если новых больше
+DIGEST_WINDOW = int(os.getenv('DIGEST_WINDOW', '0'))  # Режим digest копит объявления столько секунд (0 - в пределах цикла)
+
+# Рассылки администратора
+BROADCAST_RATE = float(os.getenv('BROADCAST_RATE', '25'))  # Доля общего лимита NOTIFY_GLOBAL_RATE для рассылок, остальное - уведомлениям
+BROADCAST_CONCURRENCY = int(os.getenv('BROADCAST_CONCURRENCY', '20'))  # Параллельных отправок
+BROADCAST_PAGE_SIZE = int(os.getenv('BROADCAST_PAGE_SIZE', '500'))  # Получателей между сохранениями курсора
+BROADCAST_PROGRESS_INTERVAL = int(os.getenv('BROADCAST_PROGRESS_INTERVAL', '5'))  # Обновление прогресса, секунды
+
+# Кэш статуса подписки
+SUBSCRIPTION_CACHE_TTL = int(os.getenv('SUBSCRIPTION_CACHE_TTL', '300'))  # Перечитывать из БД не реже, секунды
+SUBSCRIPTION_CACHE_MAX_ENTRIES = int(os.getenv('SUBSCRIPTION_CACHE_MAX_ENTRIES', '100000'))
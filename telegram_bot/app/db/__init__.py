@@ -12,6 +12,11 @@ from .model import (
     UserActivePromocode,
     Tracked,
     Item,
+    Broadcast,
+    DELIVERY_AUTO,
+    DELIVERY_INSTANT,
+    DELIVERY_DIGEST,
+    DELIVERY_MODES,
     AsyncSessionLocal,
     init_models
 )
@@ -22,6 +27,7 @@ from .repository import (
     
     # Подписки
     user_has_active_subscription,
+    invalidate_subscription_cache,
     user_has_ever_had_subscription,
     create_trial_subscription,
     
@@ -38,9 +44,16 @@ from .repository import (
     archive_tracking,
     archive_all_user_trackings,
     restore_tracking,
+    set_tracking_delivery_mode,
     delete_tracking,
     get_all_active_tracked_items,
     update_tracked_item_state,
+    filter_new_ads_for_tracking,
+    mark_ads_as_seen,
+    filter_new_ads_batch,
+    mark_ads_as_seen_batch,
+    get_recent_seen_ads,
+    delete_seen_ads_older_than,
     
     # Функции статистики
     get_monthly_statistics,
@@ -48,10 +61,13 @@ from .repository import (
     get_daily_activity_stats,
     
     # Функции уведомлений
-    get_all_users,
-    get_users_with_active_subscription,
-    get_users_without_active_subscription,
-    get_notification_stats
+    get_notification_stats,
+    
+    # Рассылки
+    create_broadcast,
+    save_broadcast_progress,
+    get_unfinished_broadcasts,
+    iter_recipient_ids
 )
 
 __all__ = [
@@ -66,12 +82,18 @@ __all__ = [
     'UserActivePromocode',
     'Tracked',
     'Item',
+    'Broadcast',
+    'DELIVERY_AUTO',
+    'DELIVERY_INSTANT',
+    'DELIVERY_DIGEST',
+    'DELIVERY_MODES',
     'AsyncSessionLocal',
     'init_models',
     
     # Функции пользователей
     'get_or_create_user',
     'user_has_active_subscription',
+    'invalidate_subscription_cache',
     'user_has_ever_had_subscription',
     'create_trial_subscription',
     
@@ -88,9 +110,16 @@ __all__ = [
     'archive_tracking',
     'archive_all_user_trackings',
     'restore_tracking',
+    'set_tracking_delivery_mode',
     'delete_tracking',
     'get_all_active_tracked_items',
     'update_tracked_item_state',
+    'filter_new_ads_for_tracking',
+    'mark_ads_as_seen',
+    'filter_new_ads_batch',
+    'mark_ads_as_seen_batch',
+    'get_recent_seen_ads',
+    'delete_seen_ads_older_than',
     
     # Функции статистики
     'get_monthly_statistics',
@@ -98,8 +127,11 @@ __all__ = [
     'get_daily_activity_stats',
     
     # Функции уведомлений
-    'get_all_users',
-    'get_users_with_active_subscription',
-    'get_users_without_active_subscription',
-    'get_notification_stats'
+    'get_notification_stats',
+    
+    # Рассылки
+    'create_broadcast',
+    'save_broadcast_progress',
+    'get_unfinished_broadcasts',
+    'iter_recipient_ids'
 ]
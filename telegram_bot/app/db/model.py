@@ -55,6 +55,11 @@ class UserSubscription(Base):
     user = relationship("User", back_populates="subscriptions")
     plan = relationship("SubscriptionPlan", back_populates="subscriptions")
 
+    __table_args__ = (
+        # Проверка подписки: последняя end_date пользователя читается из индекса
+        Index('idx_user_subscriptions_user_end', 'user_id', 'end_date'),
+    )
+
 class Payment(Base):
     __tablename__ = 'payments'
     
@@ -72,6 +77,11 @@ class Payment(Base):
     plan = relationship("SubscriptionPlan", back_populates="payments")
     promo_usages = relationship("PromoUsage", back_populates="payment")
 
+    __table_args__ = (
+        # Приоритет уведомлений: были ли у пользователя успешные оплаты
+        Index('idx_payments_user_paid', 'user_id', postgresql_where=text('status')),
+    )
+
 class Promocode(Base):
     __tablename__ = 'promocodes'
     
@@ -121,6 +131,13 @@ class UserActivePromocode(Base):
     promocode = relationship("Promocode")
 
 
+# Режимы доставки уведомлений отслеживания
+DELIVERY_AUTO = 'auto'  # Немного новых объявлений - по одному, много - одной сводкой
+DELIVERY_INSTANT = 'instant'  # Каждое объявление отдельным сообщением
+DELIVERY_DIGEST = 'digest'  # Всегда сводкой
+DELIVERY_MODES = (DELIVERY_AUTO, DELIVERY_INSTANT, DELIVERY_DIGEST)
+
+
 class Tracked(Base):
     """Таблица отслеживаемых объявлений пользователя"""
     __tablename__ = 'tracked'
@@ -132,6 +149,7 @@ class Tracked(Base):
     min_price = Column(Integer, nullable=True)
     max_price = Column(Integer, nullable=True)
     is_active = Column(Boolean, default=True)
+    delivery_mode = Column(Text, nullable=False, default=DELIVERY_AUTO, server_default=DELIVERY_AUTO)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow)
     
@@ -139,26 +157,102 @@ class Tracked(Base):
     user = relationship("User", back_populates="trackings")
     items = relationship("Item", back_populates="tracked", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        # Список отслеживаний пользователя (все или только активные) и активные отслеживания цикла
+        Index('idx_tracked_user_active', 'user_id', 'is_active'),
+    )
+
 
 class Item(Base):
-    """Таблица просмотренных объявлений в разрезе конкретного трекинга"""
+    """
+    Таблица просмотренных объявлений в разрезе конкретного трекинга
+
+    Ключ - сама тройка (tracked_id, ad_id, price): отдельный UUID и дублирующие
+    его уникальный индекс не нужны. Старые строки удаляет задача очистки по created_at.
+    """
     __tablename__ = 'items'
 
-    id = Column(UUID(as_uuid=True), primary_key=True, server_default=text("uuid_generate_v4()"))
-    ad_id = Column(BigInteger, nullable=False)
-    price = Column(Integer, nullable=False)
-    tracked_id = Column(UUID(as_uuid=True), ForeignKey('tracked.id', ondelete='CASCADE'), nullable=False)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    tracked_id = Column(UUID(as_uuid=True), ForeignKey('tracked.id', ondelete='CASCADE'), primary_key=True)
+    ad_id = Column(BigInteger, primary_key=True)
+    price = Column(Integer, primary_key=True)
+    created_at = Column(DateTime, default=datetime.utcnow, server_default=text("timezone('utc', now())"), nullable=False)
 
     tracked = relationship("Tracked", back_populates="items")
 
     __table_args__ = (
-        UniqueConstraint('ad_id', 'price', 'tracked_id', name='uq_items_ad_price_tracked'),
-        Index('idx_items_tracked_ad_price', 'tracked_id', 'ad_id', 'price'),
+        Index('idx_items_created_at', 'created_at'),
     )
 
 
+# Статусы рассылок
+BROADCAST_RUNNING = 'running'
+BROADCAST_DONE = 'done'
+BROADCAST_FAILED = 'failed'
+
+
+class Broadcast(Base):
+    """
+    Рассылка администратора
+
+    cursor - последний обработанный telegram_id: получатели перебираются
+    по возрастанию telegram_id, поэтому после перезапуска бота рассылка
+    продолжается с места остановки.
+    """
+    __tablename__ = 'broadcasts'
+
+    id = Column(UUID(as_uuid=True), primary_key=True, server_default=text("uuid_generate_v4()"))
+    admin_id = Column(Text, nullable=False)
+    target = Column(Text, nullable=False)  # all / active / inactive
+    text = Column(Text, nullable=False)
+    status = Column(Text, nullable=False, default=BROADCAST_RUNNING)
+    cursor = Column(Text, nullable=True)
+    total = Column(Integer, default=0)
+    sent = Column(Integer, default=0)
+    failed = Column(Integer, default=0)
+    html_fallback = Column(Integer, default=0)
+    progress_chat_id = Column(Text, nullable=True)
+    progress_message_id = Column(BigInteger, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+
+# Миграции существующих таблиц; create_all не меняет уже созданные таблицы.
+# Выполняются при каждом старте и ничего не делают, если схема уже актуальна.
+SCHEMA_MIGRATIONS_SQL = [
+    # items: UUID id + уникальный индекс -> составной первичный ключ
+    """
+    DO $$
+    BEGIN
+        IF EXISTS (
+            SELECT 1 FROM information_schema.columns
+            WHERE table_name = 'items' AND column_name = 'id'
+        ) THEN
+            UPDATE items SET created_at = timezone('utc', now()) WHERE created_at IS NULL;
+            ALTER TABLE items DROP CONSTRAINT IF EXISTS items_pkey;
+            ALTER TABLE items DROP COLUMN id;
+            ALTER TABLE items DROP CONSTRAINT IF EXISTS uq_items_ad_price_tracked;
+            ALTER TABLE items ADD CONSTRAINT items_pkey PRIMARY KEY (tracked_id, ad_id, price);
+            ALTER TABLE items ALTER COLUMN created_at SET DEFAULT timezone('utc', now());
+            ALTER TABLE items ALTER COLUMN created_at SET NOT NULL;
+        END IF;
+    END
+    $$;
+    """,
+    "DROP INDEX IF EXISTS idx_items_tracked_ad_price",
+    "CREATE INDEX IF NOT EXISTS idx_items_created_at ON items (created_at)",
+    # tracked: режим доставки уведомлений
+    f"ALTER TABLE tracked ADD COLUMN IF NOT EXISTS delivery_mode TEXT NOT NULL DEFAULT '{DELIVERY_AUTO}'",
+    # Индексы горячих запросов подписки и отслеживаний
+    "CREATE INDEX IF NOT EXISTS idx_user_subscriptions_user_end ON user_subscriptions (user_id, end_date)",
+    "CREATE INDEX IF NOT EXISTS idx_payments_user_paid ON payments (user_id) WHERE status",
+    "CREATE INDEX IF NOT EXISTS idx_tracked_user_active ON tracked (user_id, is_active)",
+    # Частичный индекс дублировал idx_tracked_user_active
+    "DROP INDEX IF EXISTS idx_tracked_active_user",
+]
+
 
 async def init_models():
     async with async_engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
\ No newline at end of file
+        await conn.run_sync(Base.metadata.create_all)
+        for statement in SCHEMA_MIGRATIONS_SQL:
+            await conn.execute(text(statement))
@@ -3,13 +3,18 @@
 Вся бизнес-логика взаимодействия с БД находится здесь
 """
 import logging
-from sqlalchemy import select, tuple_, exists
+import time
+from collections import OrderedDict
+from sqlalchemy import func, select, update, delete, tuple_, exists, values, column, BigInteger, Integer
+from sqlalchemy.dialects.postgresql import UUID as PG_UUID, insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import AsyncIterator, Optional
+from app.config import SUBSCRIPTION_CACHE_TTL, SUBSCRIPTION_CACHE_MAX_ENTRIES
 from .model import (
     User, SubscriptionPlan, UserSubscription, Payment,
-    Promocode, PromoUsage, Tracked, Item, AsyncSessionLocal
+    Promocode, PromoUsage, Tracked, Item, Broadcast, AsyncSessionLocal, DELIVERY_MODES,
+    BROADCAST_RUNNING
 )
 
 logger = logging.getLogger(__name__)
@@ -49,45 +54,83 @@ async def get_or_create_user(telegram_id: str) -> User:
 
 # =================== ПОДПИСКИ ===================
 
+# Кэш статуса подписки: telegram_id -> (end_date последней подписки, is_admin, момент загрузки).
+# Истечение подписки считается локально по end_date, без запроса в БД.
+# Сбрасывается при оплате, активации промокода и создании trial; TTL страхует
+# от изменений, сделанных в обход бота (например, вручную в БД).
+_subscription_cache: "OrderedDict[str, tuple[Optional[datetime], bool, float]]" = OrderedDict()
+
+
+def invalidate_subscription_cache(telegram_id: str) -> None:
+    """Сбрасывает закэшированный статус подписки пользователя."""
+    _subscription_cache.pop(str(telegram_id), None)
+
+
+def subscription_status_query(telegram_id: str):
+    """Запрос признака админа и даты окончания самой поздней подписки."""
+    return (
+        select(
+            User.is_admin,
+            select(func.max(UserSubscription.end_date))
+            .where(UserSubscription.user_id == User.id)
+            .scalar_subquery()
+        )
+        .where(User.telegram_id == telegram_id)
+    )
+
+
+async def _load_subscription_status(telegram_id: str) -> tuple[Optional[datetime], bool]:
+    """Один запрос: признак админа и дата окончания самой поздней подписки."""
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(subscription_status_query(telegram_id))
+        row = result.first()
+        if row is None:
+            return None, False
+        return row[1], bool(row[0])
+
+
 async def user_has_active_subscription(telegram_id: str) -> bool:
     """Проверяет, есть ли у пользователя активная подписка (end_date > now) или он админ."""
+    telegram_id = str(telegram_id)
+    cached = _subscription_cache.get(telegram_id)
+    if cached and time.monotonic() - cached[2] < SUBSCRIPTION_CACHE_TTL:
+        end_date, is_admin, _ = cached
+        _subscription_cache.move_to_end(telegram_id)
+        return is_admin or (end_date is not None and end_date > datetime.utcnow())
+
     print(f"🔍 DB: user_has_active_subscription вызвана для telegram_id: {telegram_id}")
     try:
-        async with AsyncSessionLocal() as session:
-            # Сначала проверяем — не является ли пользователь админом
-            user_result = await session.execute(
-                select(User).where(User.telegram_id == telegram_id)
-            )
-            user = user_result.scalar_one_or_none()
-            if user and getattr(user, 'is_admin', False):
-                print(f"🔍 DB: Пользователь {telegram_id} — админ, возвращаем True")
-                return True
-            print(f"🔍 DB: Выполняем запрос для проверки подписки {telegram_id}")
-            result = await session.execute(
-                select(UserSubscription)
-                .join(User, User.id == UserSubscription.user_id)
-                .where(User.telegram_id == telegram_id)
-                .where(UserSubscription.end_date > datetime.utcnow())
-            )
-            has_subscription = result.first() is not None
-            print(f"🔍 DB: Пользователь {telegram_id} имеет активную подписку: {has_subscription}")
-            return has_subscription
+        end_date, is_admin = await _load_subscription_status(telegram_id)
     except Exception as e:
         print(f"❌ DB ERROR: Ошибка в user_has_active_subscription: {str(e)}")
         import traceback
         traceback.print_exc()
         return False
 
+    _subscription_cache[telegram_id] = (end_date, is_admin, time.monotonic())
+    _subscription_cache.move_to_end(telegram_id)
+    while len(_subscription_cache) > SUBSCRIPTION_CACHE_MAX_ENTRIES:
+        _subscription_cache.popitem(last=False)
+
+    has_subscription = is_admin or (end_date is not None and end_date > datetime.utcnow())
+    print(f"🔍 DB: Пользователь {telegram_id} имеет активную подписку: {has_subscription}")
+    return has_subscription
+
 
 async def user_has_ever_had_subscription(telegram_id: str) -> bool:
     """Проверяет, была ли у пользователя когда-либо подписка."""
     async with AsyncSessionLocal() as session:
         result = await session.execute(
-            select(UserSubscription)
-            .join(User, User.id == UserSubscription.user_id)
-            .where(User.telegram_id == telegram_id)
+            select(
+                exists(
+                    select(1)
+                    .select_from(UserSubscription)
+                    .join(User, User.id == UserSubscription.user_id)
+                    .where(User.telegram_id == telegram_id)
+                )
+            )
         )
-        return result.first() is not None
+        return bool(result.scalar())
 
 
 async def create_trial_subscription(telegram_id: str) -> bool:
@@ -129,6 +172,7 @@ async def create_trial_subscription(telegram_id: str) -> bool:
             )
             session.add(subscription)
             await session.commit()
+            invalidate_subscription_cache(telegram_id)
             
             print(f"✅ Trial подписка создана для пользователя {telegram_id} до {end_date}")
             return True
@@ -200,6 +244,7 @@ async def set_user_active_promocode(telegram_id: str, promocode: Promocode):
             session.add(active_promo)
         
         await session.commit()
+        invalidate_subscription_cache(telegram_id)
 
 
 async def get_user_current_promocode(telegram_id: str) -> Optional[Promocode]:
@@ -295,16 +340,22 @@ async def add_tracking(telegram_id: str, link: str, name: str = None, min_price:
         return False
 
 
+def user_trackings_query(telegram_id: str, active_only: bool = True):
+    """Запрос отслеживаний пользователя в порядке создания."""
+    # id пользователя подставляется подзапросом по уникальному telegram_id,
+    # отслеживания читаются по idx_tracked_user_active
+    user_id = select(User.id).where(User.telegram_id == telegram_id).scalar_subquery()
+    query = select(Tracked).where(Tracked.user_id == user_id).order_by(Tracked.created_at)
+    if active_only:
+        query = query.where(Tracked.is_active == True)
+    return query
+
+
 async def get_user_trackings(telegram_id: str, active_only: bool = True) -> list:
     """Получает список отслеживаний пользователя."""
     try:
         async with AsyncSessionLocal() as session:
-            query = select(Tracked).join(User, User.id == Tracked.user_id).where(User.telegram_id == telegram_id)
-            
-            if active_only:
-                query = query.where(Tracked.is_active == True)
-            
-            result = await session.execute(query)
+            result = await session.execute(user_trackings_query(telegram_id, active_only))
             trackings = result.scalars().all()
             
             return trackings
@@ -410,6 +461,39 @@ async def restore_tracking(telegram_id: str, tracking_id: str) -> bool:
         return False
 
 
+async def set_tracking_delivery_mode(telegram_id: str, tracking_id: str, mode: str) -> bool:
+    """Меняет режим доставки уведомлений отслеживания (auto / instant / digest)."""
+    if mode not in DELIVERY_MODES:
+        print(f"❌ Неизвестный режим доставки: {mode}")
+        return False
+    try:
+        async with AsyncSessionLocal() as session:
+            # Получаем отслеживание пользователя
+            result = await session.execute(
+                select(Tracked).join(User, User.id == Tracked.user_id)
+                .where(User.telegram_id == telegram_id)
+                .where(Tracked.id == tracking_id)
+            )
+            tracking = result.scalar_one_or_none()
+            
+            if not tracking:
+                print(f"❌ Отслеживание {tracking_id} не найдено для пользователя {telegram_id}")
+                return False
+            
+            tracking.delivery_mode = mode
+            tracking.updated_at = datetime.utcnow()
+            await session.commit()
+            
+            print(f"✅ Режим доставки отслеживания {tracking_id} изменён на {mode}")
+            return True
+            
+    except Exception as e:
+        print(f"❌ Ошибка при смене режима доставки: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
 async def delete_tracking(telegram_id: str, tracking_id: str) -> bool:
     """Удаляет отслеживание пользователя."""
     try:
@@ -648,67 +732,6 @@ async def get_daily_activity_stats(days: int = 7) -> list:
 
 # =================== УВЕДОМЛЕНИЯ ===================
 
-async def get_all_users() -> list:
-    """Получает всех пользователей для рассылки уведомлений."""
-    try:
-        async with AsyncSessionLocal() as session:
-            result = await session.execute(select(User))
-            users = result.scalars().all()
-            return [{'telegram_id': user.telegram_id, 'is_admin': user.is_admin} for user in users]
-    except Exception as e:
-        print(f"❌ Ошибка при получении всех пользователей: {e}")
-        import traceback
-        traceback.print_exc()
-        return []
-
-
-async def get_users_with_active_subscription() -> list:
-    """Получает пользователей с активной подпиской."""
-    try:
-        async with AsyncSessionLocal() as session:
-            from datetime import datetime
-            
-            result = await session.execute(
-                select(User)
-                .join(UserSubscription, User.id == UserSubscription.user_id)
-                .where(UserSubscription.end_date > datetime.utcnow())
-                .distinct()
-            )
-            users = result.scalars().all()
-            return [{'telegram_id': user.telegram_id, 'is_admin': user.is_admin} for user in users]
-    except Exception as e:
-        print(f"❌ Ошибка при получении пользователей с подпиской: {e}")
-        import traceback
-        traceback.print_exc()
-        return []
-
-
-async def get_users_without_active_subscription() -> list:
-    """Получает пользователей без активной подписки."""
-    try:
-        async with AsyncSessionLocal() as session:
-            from datetime import datetime
-            from sqlalchemy import and_, not_, exists
-            
-            # Подзапрос для проверки наличия активной подписки
-            active_subscription_subquery = (
-                select(UserSubscription.user_id)
-                .where(UserSubscription.end_date > datetime.utcnow())
-            )
-            
-            result = await session.execute(
-                select(User)
-                .where(not_(User.id.in_(active_subscription_subquery)))
-            )
-            users = result.scalars().all()
-            return [{'telegram_id': user.telegram_id, 'is_admin': user.is_admin} for user in users]
-    except Exception as e:
-        print(f"❌ Ошибка при получении пользователей без подписки: {e}")
-        import traceback
-        traceback.print_exc()
-        return []
-
-
 async def get_notification_stats() -> dict:
     """Получает статистику для уведомлений."""
     try:
@@ -742,8 +765,131 @@ async def get_notification_stats() -> dict:
         return {'total_users': 0, 'with_subscription': 0, 'without_subscription': 0}
 
 
+# =================== РАССЫЛКИ ===================
+
+async def create_broadcast(admin_id: str, target: str, text: str, total: int,
+                           progress_chat_id: str = None, progress_message_id: int = None) -> Optional[Broadcast]:
+    """Создаёт запись о рассылке, с которой работает фоновая задача."""
+    try:
+        async with AsyncSessionLocal() as session:
+            broadcast = Broadcast(
+                admin_id=admin_id,
+                target=target,
+                text=text,
+                total=total,
+                progress_chat_id=progress_chat_id,
+                progress_message_id=progress_message_id,
+            )
+            session.add(broadcast)
+            await session.commit()
+            await session.refresh(broadcast)
+            return broadcast
+    except Exception as e:
+        print(f"❌ Ошибка при создании рассылки: {e}")
+        import traceback
+        traceback.print_exc()
+        return None
+
+
+async def save_broadcast_progress(broadcast_id, cursor: Optional[str], sent: int, failed: int,
+                                  html_fallback: int, status: str = BROADCAST_RUNNING) -> None:
+    """Сохраняет курсор и счётчики рассылки (и статус, когда она завершена)."""
+    try:
+        async with AsyncSessionLocal() as session:
+            await session.execute(
+                update(Broadcast)
+                .where(Broadcast.id == broadcast_id)
+                .values(
+                    cursor=cursor,
+                    sent=sent,
+                    failed=failed,
+                    html_fallback=html_fallback,
+                    status=status,
+                    updated_at=datetime.utcnow(),
+                )
+            )
+            await session.commit()
+    except Exception as e:
+        print(f"❌ Ошибка при сохранении прогресса рассылки {broadcast_id}: {e}")
+
+
+async def get_unfinished_broadcasts() -> list:
+    """Рассылки, прерванные перезапуском бота."""
+    try:
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(
+                select(Broadcast)
+                .where(Broadcast.status == BROADCAST_RUNNING)
+                .order_by(Broadcast.created_at)
+            )
+            return result.scalars().all()
+    except Exception as e:
+        print(f"❌ Ошибка при получении незавершённых рассылок: {e}")
+        return []
+
+
+async def iter_recipient_ids(target: str = "all", after: Optional[str] = None,
+                             chunk_size: int = 1000) -> AsyncIterator[str]:
+    """
+    Потоково отдаёт telegram_id получателей по возрастанию, начиная после курсора after.
+
+    Выбирается только telegram_id, пачками по chunk_size (keyset-пагинация):
+    в памяти никогда не больше одной пачки, а соединение с БД не держится,
+    пока вызывающий код обрабатывает полученные id.
+    target: all / active (с активной подпиской) / inactive (без неё).
+    """
+    active_subscription = exists(
+        select(1)
+        .where(UserSubscription.user_id == User.id)
+        .where(UserSubscription.end_date > datetime.utcnow())
+    )
+    base_query = select(User.telegram_id).order_by(User.telegram_id).limit(chunk_size)
+    if target == "active":
+        base_query = base_query.where(active_subscription)
+    elif target == "inactive":
+        base_query = base_query.where(~active_subscription)
+
+    while True:
+        query = base_query if after is None else base_query.where(User.telegram_id > after)
+        async with AsyncSessionLocal() as session:
+            result = await session.stream_scalars(query.execution_options(yield_per=chunk_size))
+            chunk = [telegram_id async for telegram_id in result]
+        for telegram_id in chunk:
+            yield telegram_id
+        if len(chunk) < chunk_size:
+            return
+        after = chunk[-1]
+
+
 # =================== ПАРСИНГ И ОТСЛЕЖИВАНИЕ ===================
 
+def active_trackings_query(now: Optional[datetime] = None):
+    """
+    Запрос активных отслеживаний пользователей с активной подпиской.
+    Строки: (Tracked, telegram_id, is_paid).
+    """
+    now = now or datetime.utcnow()
+    # Используем EXISTS для избежания дубликатов при нескольких подписках
+    # Пользователи, хоть раз оплатившие подписку, получают уведомления в приоритете
+    is_paid = exists(
+        select(1)
+        .where(Payment.user_id == User.id)
+        .where(Payment.status == True)
+    ).label('is_paid')
+    return (
+        select(Tracked, User.telegram_id, is_paid)
+        .join(User, User.id == Tracked.user_id)
+        .where(Tracked.is_active == True)
+        .where(
+            exists(
+                select(1)
+                .where(UserSubscription.user_id == User.id)
+                .where(UserSubscription.end_date > now)
+            )
+        )
+    )
+
+
 async def get_active_trackings_for_subscribed_users():
     """
     Получает все активные отслеживания пользователей с активной подпиской.
@@ -752,25 +898,13 @@ async def get_active_trackings_for_subscribed_users():
     try:
         async with AsyncSessionLocal() as session:
             # Получаем активные отслеживания пользователей с активной подпиской
-            # Используем EXISTS для избежания дубликатов при нескольких подписках
-            result = await session.execute(
-                select(Tracked, User.telegram_id)
-                .join(User, User.id == Tracked.user_id)
-                .where(Tracked.is_active == True)
-                .where(
-                    exists(
-                        select(1)
-                        .where(UserSubscription.user_id == User.id)
-                        .where(UserSubscription.end_date > datetime.utcnow())
-                    )
-                )
-            )
+            result = await session.execute(active_trackings_query())
             
             trackings_data = result.all()
             
             # Группируем по пользователям
             users_trackings = {}
-            for tracking, telegram_id in trackings_data:
+            for tracking, telegram_id, paid in trackings_data:
                 if telegram_id not in users_trackings:
                     users_trackings[telegram_id] = []
                 
@@ -779,7 +913,9 @@ async def get_active_trackings_for_subscribed_users():
                     'name': tracking.name,
                     'link': tracking.link,
                     'min_price': tracking.min_price,
-                    'max_price': tracking.max_price  
+                    'max_price': tracking.max_price,
+                    'delivery_mode': tracking.delivery_mode,
+                    'is_paid': paid
                 })
             
             logger.info(f"Найдено {len(users_trackings)} пользователей с активными отслеживаниями")
@@ -866,24 +1002,190 @@ async def mark_ads_as_seen(tracked_id: str, ads: list[dict]) -> None:
     logger.info(f"Подготовлено {len(rows)} записей для сохранения")
 
     try:
-        async with AsyncSessionLocal() as session:
-            # Вставляем, игнорируя дубликаты по уникальному индексу
-            to_add = [Item(**row) for row in rows]
-            session.add_all(to_add)
-            try:
-                await session.commit()
-                logger.info(f"✅ Сохранено {len(rows)} объявлений для фильтра {tracked_id}")
-            except Exception as e:
-                # На конфликте уникальности просто откатываем без падения
-                await session.rollback()
-                error_msg = str(e)
-                if 'unique constraint' in error_msg.lower() or 'duplicate' in error_msg.lower():
-                    logger.debug(f"Дубликаты при сохранении для фильтра {tracked_id}: {e}")
-                else:
-                    logger.error(f"Критическая ошибка при сохранении для фильтра {tracked_id}: {e}")
-                    raise  # Перебрасываем если это не дубликат
+        inserted = await _insert_seen_ads(rows)
+        logger.info(f"✅ Сохранено {inserted} объявлений для фильтра {tracked_id} (дубликатов: {len(rows) - inserted})")
     except Exception as e:
         logger.error(f"❌ Ошибка при сохранении просмотренных объявлений для фильтра {tracked_id}: {e}")
         logger.exception("Детали ошибки:")
         raise  # Пробрасываем дальше, чтобы видеть в логах
 
+
+
+# Размер пачки строк в одном запросе: до 4 параметров на строку, лимит asyncpg - 32767 параметров
+SEEN_ADS_CHUNK_SIZE = 5000
+
+
+def _seen_ads_rows(ads_by_tracking: dict[str, list[dict]]) -> list[dict]:
+    """Плоский список уникальных строк (tracked_id, ad_id, price) по всем трекингам."""
+    from uuid import UUID
+
+    rows = {}
+    for tracked_id, ads in ads_by_tracking.items():
+        try:
+            tracked_uuid = UUID(str(tracked_id))
+        except Exception as e:
+            logger.error(f"Некорректный UUID для tracked_id: {tracked_id}, ошибка: {e}")
+            continue
+        for ad in ads:
+            ad_id = ad.get('id')
+            price = ad.get('price')
+            if ad_id is None or price is None:
+                logger.warning(f"Пропускаем объявление с пустыми полями: {ad}")
+                continue
+            try:
+                key = (tracked_uuid, int(ad_id), int(price))
+            except Exception as e:
+                logger.warning(f"Ошибка при конвертации объявления {ad}: {e}")
+                continue
+            rows[key] = {'tracked_id': key[0], 'ad_id': key[1], 'price': key[2]}
+    return list(rows.values())
+
+
+async def _insert_seen_ads(rows: list[dict]) -> int:
+    """
+    Идемпотентная вставка строк items: INSERT ... ON CONFLICT DO NOTHING.
+
+    Уже существующие пары (ad_id, price, tracked_id) пропускаются базой, остальные
+    строки сохраняются - дубликат больше не откатывает всю пачку.
+    Возвращает число реально вставленных строк.
+    """
+    stmt = (
+        pg_insert(Item)
+        .on_conflict_do_nothing(index_elements=['ad_id', 'price', 'tracked_id'])
+        .returning(Item.ad_id)
+    )
+    inserted = 0
+    async with AsyncSessionLocal() as session:
+        for start in range(0, len(rows), SEEN_ADS_CHUNK_SIZE):
+            # Многострочный VALUES пачками, а не INSERT на каждую строку
+            result = await session.execute(stmt.values(rows[start:start + SEEN_ADS_CHUNK_SIZE]))
+            inserted += len(result.all())
+        await session.commit()
+    return inserted
+
+
+async def filter_new_ads_batch(ads_by_tracking: dict[str, list[dict]]) -> Optional[dict[str, list[dict]]]:
+    """
+    Возвращает новые объявления сразу для всех трекингов цикла.
+
+    Кандидаты передаются одной таблицей VALUES (tracked_id, ad_id, price) и
+    соединяются с items - один запрос вместо запроса на каждый трекинг.
+    При ошибке БД возвращает None.
+    """
+    rows = _seen_ads_rows(ads_by_tracking)
+    if not rows:
+        return {}
+
+    try:
+        existing = set()
+        async with AsyncSessionLocal() as session:
+            for start in range(0, len(rows), SEEN_ADS_CHUNK_SIZE):
+                chunk = rows[start:start + SEEN_ADS_CHUNK_SIZE]
+                candidates = values(
+                    column('tracked_id', PG_UUID(as_uuid=True)),
+                    column('ad_id', BigInteger),
+                    column('price', Integer),
+                    name='candidates',
+                ).data([(row['tracked_id'], row['ad_id'], row['price']) for row in chunk])
+                result = await session.execute(
+                    select(Item.tracked_id, Item.ad_id, Item.price)
+                    .join(
+                        candidates,
+                        (Item.tracked_id == candidates.c.tracked_id)
+                        & (Item.ad_id == candidates.c.ad_id)
+                        & (Item.price == candidates.c.price)
+                    )
+                )
+                existing.update((str(row.tracked_id), row.ad_id, row.price) for row in result)
+
+        new_by_tracking = {}
+        for tracked_id, ads in ads_by_tracking.items():
+            new_ads = []
+            for ad in ads:
+                try:
+                    key = (str(tracked_id), int(ad.get('id')), int(ad.get('price')))
+                except Exception:
+                    continue
+                if key not in existing:
+                    new_ads.append(ad)
+            if new_ads:
+                new_by_tracking[tracked_id] = new_ads
+
+        logger.debug(
+            f"Пакетная проверка: {len(ads_by_tracking)} трекингов, {len(rows)} пар, "
+            f"{len(existing)} уже были, новых у {len(new_by_tracking)} трекингов"
+        )
+        return new_by_tracking
+    except Exception as e:
+        # При ошибке не отправляем ничего, чтобы не было дубликатов
+        logger.error(f"Ошибка при пакетной фильтрации новых объявлений: {e}")
+        logger.exception("Детали ошибки:")
+        return None
+
+
+async def mark_ads_as_seen_batch(ads_by_tracking: dict[str, list[dict]]) -> None:
+    """Помечает объявления как просмотренные сразу для всех трекингов одной транзакцией."""
+    rows = _seen_ads_rows(ads_by_tracking)
+    if not rows:
+        return
+
+    try:
+        inserted = await _insert_seen_ads(rows)
+        logger.info(
+            f"✅ Сохранено {inserted} объявлений для {len(ads_by_tracking)} трекингов "
+            f"(дубликатов: {len(rows) - inserted})"
+        )
+    except Exception as e:
+        logger.error(f"❌ Ошибка при пакетном сохранении просмотренных объявлений: {e}")
+        logger.exception("Детали ошибки:")
+        raise
+
+
+async def get_recent_seen_ads(since: datetime, limit: int) -> list[tuple[str, int, int]]:
+    """
+    Последние сохранённые ключи (tracked_id, ad_id, price) для прогрева кэша.
+    Возвращаются от старых к новым.
+    """
+    try:
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(
+                select(Item.tracked_id, Item.ad_id, Item.price)
+                .where(Item.created_at >= since)
+                .order_by(Item.created_at.desc())
+                .limit(limit)
+            )
+            keys = [(str(row.tracked_id), row.ad_id, row.price) for row in result]
+            keys.reverse()
+            return keys
+    except Exception as e:
+        logger.error(f"Ошибка при загрузке недавних объявлений для кэша: {e}")
+        return []
+
+
+async def delete_seen_ads_older_than(before: datetime, batch_size: int = 10000) -> int:
+    """
+    Удаляет записи items старше before пачками, каждая пачка - отдельная транзакция,
+    чтобы не держать долгих блокировок. Возвращает число удалённых строк.
+    """
+    deleted = 0
+    try:
+        while True:
+            async with AsyncSessionLocal() as session:
+                old_rows = (
+                    select(Item.tracked_id, Item.ad_id, Item.price)
+                    .where(Item.created_at < before)
+                    .limit(batch_size)
+                )
+                result = await session.execute(
+                    delete(Item).where(tuple_(Item.tracked_id, Item.ad_id, Item.price).in_(old_rows))
+                )
+                await session.commit()
+            deleted += result.rowcount
+            if result.rowcount < batch_size:
+                break
+        if deleted:
+            logger.info(f"🧹 Удалено {deleted} просмотренных объявлений старше {before:%Y-%m-%d %H:%M}")
+        return deleted
+    except Exception as e:
+        logger.error(f"Ошибка при очистке старых просмотренных объявлений: {e}")
+        return deleted
@@ -8,6 +8,8 @@ from app.bot.handlers import base, search, admin, payments, tracking
 from app.db import init_models
 from app.middlewares import SubscriptionCheckMiddleware
 from app.services.tracking_service import init_tracking_service
+from app.services.notification_dispatcher import init_notification_dispatcher
+from app.services.broadcast_service import init_broadcast_service
 from aiogram.client.default import DefaultBotProperties
 
 logger = setup_logging()
@@ -50,8 +52,13 @@ async def main():
     ]
     await bot.set_my_commands(commands)
 
-    # Инициализируем сервис отслеживания
-    tracking_service = init_tracking_service(bot)
+    # Запускаем очередь уведомлений и сервис отслеживания
+    notification_dispatcher = init_notification_dispatcher(bot)
+    tracking_service = init_tracking_service(bot, notification_dispatcher)
+
+    # Продолжаем рассылки, прерванные прошлым перезапуском
+    broadcast_service = init_broadcast_service(bot, notification_dispatcher)
+    await broadcast_service.resume_unfinished()
     
     # Запускаем сервис отслеживания в фоновой задаче
     tracking_task = asyncio.create_task(tracking_service.start_tracking())
@@ -67,6 +74,8 @@ async def main():
             await tracking_task
         except asyncio.CancelledError:
             pass
+        await notification_dispatcher.stop()
+        await broadcast_service.stop()
 
 if __name__ == "__main__":
     asyncio.run(main())
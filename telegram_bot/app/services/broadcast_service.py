@@ -0,0 +1,263 @@
+"""
+Фоновые рассылки администратора
+
+Рассылка идёт отдельной задачей и не держит обработчик админки. Получатели
+читаются из БД потоком по возрастанию telegram_id, каждая страница отправляется
+пулом параллельных отправщиков. Каждое сообщение расходует токен общего
+лимита бота из очереди уведомлений и токен доли рассылок (BROADCAST_RATE),
+поэтому вместе с уведомлениями бот не превышает лимит Telegram. После каждой
+страницы курсор и счётчики сохраняются в БД, поэтому после перезапуска
+бота рассылка продолжается с места остановки. Доставка «хотя бы один раз»:
+страница, прерванная остановкой бота, отправляется заново целиком, и часть её
+получателей может получить сообщение дважды; счётчики при этом откатываются
+к началу страницы и не считают их повторно. Сообщение с прогрессом
+обновляется по таймеру.
+"""
+import asyncio
+import logging
+from typing import Dict, Optional
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest, TelegramRetryAfter
+
+from app.config import (
+    BROADCAST_RATE, BROADCAST_CONCURRENCY, BROADCAST_PAGE_SIZE, BROADCAST_PROGRESS_INTERVAL
+)
+from app.db import (
+    Broadcast, create_broadcast, save_broadcast_progress,
+    get_unfinished_broadcasts, iter_recipient_ids
+)
+from app.db.model import BROADCAST_RUNNING, BROADCAST_DONE, BROADCAST_FAILED
+from app.services.notification_dispatcher import NotificationDispatcher, TokenBucket
+
+logger = logging.getLogger(__name__)
+
+TARGET_NAMES = {
+    "all": "всем пользователям",
+    "active": "пользователям с активной подпиской",
+    "inactive": "пользователям без подписки",
+}
+
+
+class BroadcastJob:
+    """Состояние одной выполняющейся рассылки"""
+
+    def __init__(self, broadcast: Broadcast):
+        self.broadcast = broadcast
+        self.cursor = broadcast.cursor
+        self.sent = broadcast.sent or 0
+        self.failed = broadcast.failed or 0
+        self.html_fallback = broadcast.html_fallback or 0
+        self._checkpoint = (self.cursor, self.sent, self.failed, self.html_fallback)
+
+    def checkpoint(self, cursor: str):
+        """Запоминает курсор последней полностью отправленной страницы вместе со счётчиками"""
+        self.cursor = cursor
+        self._checkpoint = (self.cursor, self.sent, self.failed, self.html_fallback)
+
+    def rollback(self):
+        """Возвращает счётчики к последнему курсору: недоотправленная страница будет отправлена заново"""
+        self.cursor, self.sent, self.failed, self.html_fallback = self._checkpoint
+
+    @property
+    def processed(self) -> int:
+        return self.sent + self.failed
+
+    def progress_text(self) -> str:
+        total = self.broadcast.total or 0
+        text = (
+            f"📤 <b>Рассылка в процессе...</b>\n"
+            f"👥 Всего: {total}\n"
+            f"✅ Отправлено: {self.sent}\n"
+            f"❌ Ошибок: {self.failed}\n"
+            f"📊 Прогресс: {self.processed}/{total}"
+        )
+        if self.html_fallback > 0:
+            text += f"\n⚠️ HTML ошибок: {self.html_fallback}"
+        return text
+
+    def final_report(self) -> str:
+        processed = self.processed
+        report = (
+            f"✅ <b>Рассылка завершена!</b>\n\n"
+            f"📊 <b>Статистика:</b>\n"
+            f"├ Всего получателей: {processed}\n"
+            f"├ Успешно доставлено: {self.sent}\n"
+            f"├ Ошибок доставки: {self.failed}"
+        )
+        if self.html_fallback > 0:
+            report += f"\n├ HTML ошибок (отправлено без форматирования): {self.html_fallback}"
+        report += f"\n└ Процент успеха: {(self.sent / processed * 100) if processed > 0 else 0:.1f}%"
+        return report
+
+
+class BroadcastService:
+    """Запускает и возобновляет фоновые рассылки"""
+
+    def __init__(self, bot: Bot, dispatcher: NotificationDispatcher):
+        self.bot = bot
+        self.dispatcher = dispatcher
+        self._bucket = TokenBucket(BROADCAST_RATE)  # Доля рассылок в общем лимите
+        self._global_bucket = dispatcher.global_bucket  # Общий с уведомлениями лимит бота
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    async def start_broadcast(self, admin_id: str, target: str, text: str, total: int,
+                              progress_chat_id: str, progress_message_id: int) -> Optional[Broadcast]:
+        """Создаёт рассылку в БД и запускает её в фоне"""
+        broadcast = await create_broadcast(
+            admin_id=admin_id,
+            target=target,
+            text=text,
+            total=total,
+            progress_chat_id=progress_chat_id,
+            progress_message_id=progress_message_id,
+        )
+        if broadcast:
+            self._spawn(broadcast)
+        return broadcast
+
+    async def resume_unfinished(self):
+        """Продолжает рассылки, прерванные перезапуском бота"""
+        for broadcast in await get_unfinished_broadcasts():
+            logger.info(f"Возобновляем рассылку {broadcast.id} с курсора {broadcast.cursor}")
+            self._spawn(broadcast)
+
+    async def stop(self):
+        for task in self._tasks.values():
+            task.cancel()
+        await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+
+    def _spawn(self, broadcast: Broadcast):
+        key = str(broadcast.id)
+        if key in self._tasks:
+            return
+        task = asyncio.create_task(self._run(BroadcastJob(broadcast)))
+        self._tasks[key] = task
+        task.add_done_callback(lambda _task: self._tasks.pop(key, None))
+
+    async def _run(self, job: BroadcastJob):
+        broadcast = job.broadcast
+        progress_task = asyncio.create_task(self._progress_loop(job))
+        status = BROADCAST_FAILED
+        try:
+            semaphore = asyncio.Semaphore(BROADCAST_CONCURRENCY)
+            page = []
+            # Получатели читаются из БД по мере отправки - память не зависит от числа пользователей
+            async for chat_id in iter_recipient_ids(broadcast.target, job.cursor, BROADCAST_PAGE_SIZE):
+                page.append(chat_id)
+                if len(page) >= BROADCAST_PAGE_SIZE:
+                    await self._send_page(semaphore, job, page)
+                    page = []
+            if page:
+                await self._send_page(semaphore, job, page)
+            status = BROADCAST_DONE
+        except asyncio.CancelledError:
+            # Остановка бота: рассылка остаётся running и продолжится при следующем запуске
+            # с начала недоотправленной страницы, поэтому и счётчики сохраняются на её начало
+            status = BROADCAST_RUNNING
+            job.rollback()
+            raise
+        except Exception as e:
+            logger.error(f"Рассылка {broadcast.id} прервана ошибкой: {e}")
+        finally:
+            progress_task.cancel()
+            await save_broadcast_progress(
+                broadcast.id, job.cursor, job.sent, job.failed, job.html_fallback, status=status
+            )
+            if status != BROADCAST_RUNNING:
+                await self._edit_progress(job, job.final_report())
+                logger.info(f"Рассылка {broadcast.id} завершена: отправлено {job.sent}, ошибок {job.failed}")
+
+    async def _send_page(self, semaphore: asyncio.Semaphore, job: BroadcastJob, page: list):
+        await asyncio.gather(*(self._send_limited(semaphore, job, chat_id) for chat_id in page))
+        # Курсор сохраняем только после отправки всей страницы
+        job.checkpoint(page[-1])
+        await save_broadcast_progress(job.broadcast.id, job.cursor, job.sent, job.failed, job.html_fallback)
+
+    async def _send_limited(self, semaphore: asyncio.Semaphore, job: BroadcastJob, chat_id: str):
+        async with semaphore:
+            await self._send(job, chat_id)
+
+    async def _wait_for_slot(self):
+        """Ждёт свободного токена в доле рассылок и в общем лимите бота (включая паузу после RetryAfter)"""
+        loop = asyncio.get_running_loop()
+        while True:
+            now = loop.time()
+            delay = max(self._bucket.delay(now), self._global_bucket.delay(now))
+            if delay <= 0:
+                self._bucket.consume(now)
+                self._global_bucket.consume(now)
+                return
+            await asyncio.sleep(delay)
+
+    async def _send(self, job: BroadcastJob, chat_id: str):
+        text = job.broadcast.text
+        while True:
+            await self._wait_for_slot()
+            try:
+                await self.bot.send_message(chat_id=chat_id, text=text, parse_mode="HTML")
+                job.sent += 1
+                return
+            except TelegramRetryAfter as e:
+                # Flood control общий на бота: приостанавливаем все отправки, включая уведомления
+                logger.warning(f"Flood control при рассылке: пауза {e.retry_after}с")
+                self.dispatcher.flood_control(e.retry_after)
+            except TelegramBadRequest as e:
+                if "can't parse entities" not in str(e).lower():
+                    job.failed += 1
+                    return
+                # Отправляем без HTML разметки как fallback
+                try:
+                    await self._wait_for_slot()
+                    await self.bot.send_message(
+                        chat_id=chat_id,
+                        text=f"⚠️ Сообщение от администрации (без форматирования):\n\n{text}"
+                    )
+                    job.sent += 1
+                    job.html_fallback += 1
+                except Exception:
+                    job.failed += 1
+                return
+            except Exception as e:
+                job.failed += 1
+                logger.debug(f"Ошибка отправки пользователю {chat_id}: {e}")
+                return
+
+    async def _progress_loop(self, job: BroadcastJob):
+        """Обновляет сообщение с прогрессом раз в BROADCAST_PROGRESS_INTERVAL секунд"""
+        last_text = None
+        while True:
+            await asyncio.sleep(BROADCAST_PROGRESS_INTERVAL)
+            text = job.progress_text()
+            if text != last_text:
+                await self._edit_progress(job, text)
+                last_text = text
+
+    async def _edit_progress(self, job: BroadcastJob, text: str):
+        broadcast = job.broadcast
+        if not broadcast.progress_chat_id or not broadcast.progress_message_id:
+            return
+        try:
+            await self.bot.edit_message_text(
+                text=text,
+                chat_id=broadcast.progress_chat_id,
+                message_id=broadcast.progress_message_id,
+                parse_mode="HTML"
+            )
+        except Exception:
+            pass  # Игнорируем ошибки редактирования
+
+
+# Глобальный сервис рассылок
+broadcast_service: Optional[BroadcastService] = None
+
+
+def init_broadcast_service(bot: Bot, dispatcher: NotificationDispatcher) -> BroadcastService:
+    """Инициализирует глобальный сервис рассылок"""
+    global broadcast_service
+    broadcast_service = BroadcastService(bot, dispatcher)
+    return broadcast_service
+
+
+def get_broadcast_service() -> Optional[BroadcastService]:
+    return broadcast_service
@@ -0,0 +1,232 @@
+"""
+Очередь отправки уведомлений в Telegram с ограничением скорости
+
+Сообщения складываются в приоритетную очередь и отправляются несколькими
+параллельными воркерами. Скорость ограничена двумя ведрами токенов:
+общим на бота (~30 сообщений/с) и отдельным на каждый чат (~1 сообщение/с).
+Сообщение в «занятый» чат откладывается, не задерживая остальные чаты.
+TelegramRetryAfter приостанавливает все отправки бота, временные ошибки повторяются с паузой.
+"""
+import asyncio
+import itertools
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError, TelegramRetryAfter
+
+from app.config import NOTIFY_GLOBAL_RATE, NOTIFY_CHAT_RATE, NOTIFY_WORKERS, NOTIFY_MAX_RETRIES
+
+logger = logging.getLogger(__name__)
+
+# Приоритеты: меньше - раньше
+PRIORITY_PAID = 0  # Пользователи с оплаченной подпиской
+PRIORITY_DEFAULT = 1
+PRIORITY_LOW = 2  # Массовые рассылки
+
+RETRY_BASE_DELAY = 2.0  # Пауза перед повтором при временной ошибке, растёт с каждой попыткой
+MAX_IDLE_CHAT_BUCKETS = 10000  # После этого из памяти убираются ведра простаивающих чатов
+
+
+class TokenBucket:
+    """Ведро токенов: rate токенов в секунду, не больше capacity за раз"""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated_at = 0.0
+        self.blocked_until = 0.0  # До этого момента токены не выдаются (RetryAfter)
+
+    def _refill(self, now: float) -> None:
+        if self.updated_at:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def delay(self, now: float) -> float:
+        """Сколько секунд ждать до появления токена (0 - токен есть)"""
+        self._refill(now)
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def consume(self, now: float) -> None:
+        self._refill(now)
+        self.tokens -= 1
+
+    def block(self, now: float, seconds: float) -> None:
+        self.blocked_until = max(self.blocked_until, now + seconds)
+
+    def is_idle(self, now: float) -> bool:
+        self._refill(now)
+        return self.tokens >= self.capacity and now >= self.blocked_until
+
+
+@dataclass(order=True)
+class Notification:
+    priority: int
+    seq: int
+    chat_id: str = field(compare=False)
+    text: str = field(compare=False)
+    kwargs: Dict[str, Any] = field(compare=False, default_factory=dict)
+    attempts: int = field(compare=False, default=0)
+
+
+class NotificationDispatcher:
+    """Приоритетная очередь уведомлений с параллельными отправщиками"""
+
+    def __init__(
+            self,
+            bot: Bot,
+            workers: int = NOTIFY_WORKERS,
+            global_rate: float = NOTIFY_GLOBAL_RATE,
+            chat_rate: float = NOTIFY_CHAT_RATE,
+            max_retries: int = NOTIFY_MAX_RETRIES,
+    ):
+        self.bot = bot
+        self.workers_count = workers
+        self.chat_rate = chat_rate
+        self.max_retries = max_retries
+        self._queue: asyncio.PriorityQueue = asyncio.PriorityQueue()
+        # Общий лимит бота; его же расходуют рассылки (BroadcastService)
+        self.global_bucket = TokenBucket(global_rate)
+        self._chat_buckets: Dict[str, TokenBucket] = {}
+        self._seq = itertools.count()
+        self._workers: List[asyncio.Task] = []
+        self._delayed = 0  # Отложенные сообщения, которые ещё не вернулись в очередь
+        self.metrics = {
+            'sent': 0,
+            'failed': 0,
+            'retried': 0,
+            'retry_after': 0,
+        }
+
+    def start(self):
+        """Запускает воркеры отправки"""
+        if self._workers:
+            return
+        self._workers = [
+            asyncio.create_task(self._worker(), name=f"notify-{index}")
+            for index in range(self.workers_count)
+        ]
+        logger.info(f"🚀 Запущена очередь уведомлений: {self.workers_count} отправщиков")
+
+    async def stop(self):
+        """Останавливает воркеры; неотправленные сообщения теряются"""
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        if self._queue.qsize() or self._delayed:
+            logger.warning(f"Очередь уведомлений остановлена, не отправлено: {self._queue.qsize() + self._delayed}")
+
+    def enqueue(self, chat_id: str, text: str, priority: int = PRIORITY_DEFAULT, **kwargs):
+        """Ставит сообщение в очередь; kwargs передаются в bot.send_message"""
+        self._queue.put_nowait(Notification(priority, next(self._seq), str(chat_id), text, kwargs))
+
+    def get_metrics(self) -> Dict[str, Any]:
+        return {**self.metrics, 'queued': self._queue.qsize(), 'delayed': self._delayed}
+
+    def _chat_bucket(self, chat_id: str, now: float) -> TokenBucket:
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            if len(self._chat_buckets) >= MAX_IDLE_CHAT_BUCKETS:
+                self._chat_buckets = {
+                    key: value for key, value in self._chat_buckets.items() if not value.is_idle(now)
+                }
+            bucket = self._chat_buckets[chat_id] = TokenBucket(self.chat_rate, capacity=1)
+        return bucket
+
+    def flood_control(self, retry_after: float, chat_id: Optional[str] = None):
+        """
+        Выдерживает TelegramRetryAfter: лимит общий на бота, поэтому блокируется
+        общее ведро (его же расходуют рассылки), а при известном чате - и ведро чата
+        """
+        now = asyncio.get_running_loop().time()
+        self.metrics['retry_after'] += 1
+        self.global_bucket.block(now, retry_after)
+        if chat_id is not None:
+            self._chat_bucket(chat_id, now).block(now, retry_after)
+
+    def _requeue_later(self, notification: Notification, delay: float):
+        """Возвращает сообщение в очередь через delay секунд, не занимая воркер"""
+        self._delayed += 1
+
+        def put_back():
+            self._delayed -= 1
+            self._queue.put_nowait(notification)
+
+        asyncio.get_running_loop().call_later(delay, put_back)
+
+    async def _worker(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            notification = await self._queue.get()
+            try:
+                now = loop.time()
+                chat_bucket = self._chat_bucket(notification.chat_id, now)
+                chat_delay = chat_bucket.delay(now)
+                if chat_delay > 0:
+                    # Чат упёрся в лимит - откладываем, воркер берёт следующее сообщение
+                    self._requeue_later(notification, chat_delay)
+                    continue
+
+                # Общий лимит бота ждём прямо здесь: он одинаков для всех сообщений
+                while (global_delay := self.global_bucket.delay(loop.time())) > 0:
+                    await asyncio.sleep(global_delay)
+                now = loop.time()
+                self.global_bucket.consume(now)
+                chat_bucket.consume(now)
+
+                await self._send(notification)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Ошибка в очереди уведомлений: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def _send(self, notification: Notification):
+        try:
+            await self.bot.send_message(chat_id=notification.chat_id, text=notification.text, **notification.kwargs)
+            self.metrics['sent'] += 1
+        except TelegramRetryAfter as e:
+            # Telegram просит подождать: приостанавливаем все отправки бота и повторяем без учёта попытки
+            logger.warning(f"Flood control для {notification.chat_id}: ждём {e.retry_after}с")
+            self.flood_control(e.retry_after, notification.chat_id)
+            self._requeue_later(notification, e.retry_after)
+        except (TelegramForbiddenError, TelegramBadRequest) as e:
+            # Бот заблокирован или сообщение некорректно - повтор не поможет
+            self.metrics['failed'] += 1
+            logger.error(f"Не удалось отправить уведомление пользователю {notification.chat_id}: {e}")
+        except Exception as e:
+            notification.attempts += 1
+            if notification.attempts > self.max_retries:
+                self.metrics['failed'] += 1
+                logger.error(
+                    f"Уведомление пользователю {notification.chat_id} не отправлено "
+                    f"после {notification.attempts} попыток: {e}"
+                )
+                return
+            self.metrics['retried'] += 1
+            delay = RETRY_BASE_DELAY * 2 ** (notification.attempts - 1)
+            logger.warning(
+                f"Ошибка отправки пользователю {notification.chat_id} "
+                f"(попытка {notification.attempts}/{self.max_retries}), повтор через {delay:.0f}с: {e}"
+            )
+            self._requeue_later(notification, delay)
+
+
+# Глобальная очередь уведомлений
+notification_dispatcher: Optional[NotificationDispatcher] = None
+
+
+def init_notification_dispatcher(bot: Bot) -> NotificationDispatcher:
+    """Создаёт и запускает глобальную очередь уведомлений"""
+    global notification_dispatcher
+    notification_dispatcher = NotificationDispatcher(bot)
+    notification_dispatcher.start()
+    return notification_dispatcher
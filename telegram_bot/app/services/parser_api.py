@@ -3,8 +3,9 @@ API клиент для взаимодействия с сервисом пар
 """
 import aiohttp
 import asyncio
+import json
 import logging
-from typing import List, Dict, Any, Optional
+from typing import AsyncIterator, List, Dict, Any, Optional
 from app.config import PARSER_API_URL, PARSER_API_TOKEN
 
 logger = logging.getLogger(__name__)
@@ -16,7 +17,9 @@ class ParserAPIClient:
         self.api_url = PARSER_API_URL
         self.api_token = PARSER_API_TOKEN
         
-    async def parse_ads(self, urls: List[str], min_price: int = 0, max_price: int = 0) -> Optional[Dict[str, Any]]:
+    async def parse_ads(self, urls: List[str], min_price: int = 0, max_price: int = 0,
+                        cursor: Optional[Dict[str, int]] = None, pages: int = 1,
+                        max_age: Optional[int] = None) -> Optional[Dict[str, Any]]:
         """
         Отправляет запрос на парсинг объявлений
         
@@ -24,6 +27,9 @@ class ParserAPIClient:
             urls: Список URL для парсинга
             min_price: Минимальная цена
             max_price: Максимальная цена
+            cursor: Курсор из прошлого ответа - вернуть только более новые объявления
+            pages: Сколько страниц поиска просмотреть
+            max_age: Отбросить объявления старше стольких секунд
             
         Returns:
             Ответ API или None в случае ошибки
@@ -46,6 +52,12 @@ class ParserAPIClient:
             "min_price": min_price,
             "max_price": max_price
         }
+        if cursor:
+            payload["cursor"] = cursor
+        if pages > 1:
+            payload["pages"] = pages
+        if max_age:
+            payload["max_age"] = max_age
         
         max_retries = 2  # Дополнительная попытка при таймауте
         timeout_seconds = 60  # Увеличиваем таймаут до 60 секунд
@@ -92,5 +104,54 @@ class ParserAPIClient:
                 
         return None
 
+    @property
+    def batch_url(self) -> str:
+        """Адрес пакетного эндпоинта: PARSER_API_URL указывает на /parse или на корень API"""
+        base_url = self.api_url.rstrip('/')
+        return f"{base_url}/batch" if base_url.endswith('/parse') else f"{base_url}/parse/batch"
+
+    async def parse_batch(self, searches: List[Dict[str, Any]], timeout_seconds: int = 300) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Пакетный парсинг: много поисков одним запросом
+        
+        Args:
+            searches: Поиски вида {"id": ..., "url": ..., "min_price": ..., "max_price": ..., "cursor": ..., "pages": ..., "max_age": ...}
+            timeout_seconds: Общий таймаут запроса
+            
+        Yields:
+            Результаты поисков по мере готовности:
+            {"id", "success", "message", "ads", "total_found", "cursor"}
+        """
+        if not self.api_token or not self.api_url:
+            logger.error("PARSER_API_URL или PARSER_API_TOKEN не установлены в конфигурации")
+            return
+        
+        headers = {
+            'Authorization': f'Bearer {self.api_token}',
+            'Content-Type': 'application/json'
+        }
+        
+        logger.info(f"Отправляем пакетный запрос на парсинг: {len(searches)} поисков")
+        try:
+            async with aiohttp.ClientSession() as session:
+                async with session.post(
+                    self.batch_url,
+                    json={"searches": searches},
+                    headers=headers,
+                    timeout=aiohttp.ClientTimeout(total=timeout_seconds)
+                ) as response:
+                    if response.status != 200:
+                        error_text = await response.text()
+                        logger.error(f"Ошибка пакетного API парсинга: {response.status} - {error_text}")
+                        return
+                    # Ответ - NDJSON: по строке на поиск, в порядке готовности
+                    async for line in response.content:
+                        if line.strip():
+                            yield json.loads(line)
+        except asyncio.TimeoutError:
+            logger.warning(f"Таймаут пакетного запроса к API парсинга ({timeout_seconds}с)")
+        except aiohttp.ClientError as e:
+            logger.error(f"Ошибка сети при пакетном запросе к API парсинга: {e}")
+
 # Глобальный экземпляр клиента
 parser_client = ParserAPIClient()
@@ -0,0 +1,101 @@
+"""
+Ограниченный кэш просмотренных объявлений в памяти процесса
+
+Хранит недавние ключи (tracked_id, ad_id, price), о которых уже известно,
+что они есть в таблице items. Большинство объявлений на странице каталога
+были и в прошлом цикле, поэтому в БД уходят только ключи, которых нет в кэше.
+Кэш общий для всех отслеживаний: размер ограничен глобально (LRU),
+записи устаревают по TTL.
+"""
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Tuple
+
+from app.config import SEEN_CACHE_MAX_ENTRIES, SEEN_CACHE_TTL
+
+logger = logging.getLogger(__name__)
+
+SeenKey = Tuple[str, int, int]
+
+
+def seen_key(tracked_id: str, ad: Dict[str, Any]) -> SeenKey:
+    """Ключ объявления в разрезе отслеживания"""
+    return str(tracked_id), int(ad['id']), int(ad['price'])
+
+
+class SeenAdsCache:
+    """LRU/TTL кэш ключей объявлений, которые уже сохранены в items"""
+
+    def __init__(self, max_entries: int = SEEN_CACHE_MAX_ENTRIES, ttl: float = SEEN_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[SeenKey, float]" = OrderedDict()  # ключ -> момент устаревания
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def contains(self, key: SeenKey) -> bool:
+        expires_at = self._entries.get(key)
+        if expires_at is None:
+            return False
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return False
+        self._entries.move_to_end(key)
+        return True
+
+    def add(self, key: SeenKey) -> None:
+        self._entries[key] = time.monotonic() + self.ttl
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def add_ads(self, ads_by_tracking: Dict[str, List[Dict[str, Any]]]) -> None:
+        for tracked_id, ads in ads_by_tracking.items():
+            for ad in ads:
+                try:
+                    self.add(seen_key(tracked_id, ad))
+                except (KeyError, TypeError, ValueError):
+                    continue
+
+    def split(self, ads_by_tracking: Dict[str, List[Dict[str, Any]]]) -> Dict[str, List[Dict[str, Any]]]:
+        """Возвращает объявления, которых нет в кэше (их нужно проверить в БД)"""
+        unknown: Dict[str, List[Dict[str, Any]]] = {}
+        for tracked_id, ads in ads_by_tracking.items():
+            for ad in ads:
+                try:
+                    key = seen_key(tracked_id, ad)
+                except (KeyError, TypeError, ValueError):
+                    continue
+                if self.contains(key):
+                    self.hits += 1
+                else:
+                    self.misses += 1
+                    unknown.setdefault(tracked_id, []).append(ad)
+        return unknown
+
+    def warm(self, keys: List[SeenKey]) -> None:
+        """Заполняет кэш ключами из БД (от старых к новым, чтобы свежие вытеснялись последними)"""
+        for key in keys:
+            self.add(key)
+        logger.info(f"Кэш просмотренных объявлений прогрет: {len(self._entries)} ключей")
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'max_entries': self.max_entries,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+            'evictions': self.evictions,
+        }
+
+
+# Глобальный кэш для сервиса отслеживания
+seen_ads_cache = SeenAdsCache()
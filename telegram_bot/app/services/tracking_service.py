@@ -3,23 +3,88 @@
 """
 import asyncio
 import logging
-from typing import Dict, Any, List
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional, Set, Tuple
 from aiogram import Bot
+from app.config import (
+    TRACKING_INTERVAL, TRACKING_CONCURRENCY, TRACKING_CYCLE_DEADLINE, TRACKING_BATCH_SIZE, TRACKING_PAGES, TRACKING_USE_CURSOR,
+    TRACKING_FULL_SCAN_EVERY,
+    ITEMS_RETENTION_DAYS,
+    DIGEST_THRESHOLD, DIGEST_WINDOW
+)
+from app.db.model import DELIVERY_AUTO, DELIVERY_DIGEST
 from app.services.parser_api import parser_client
+from app.services.seen_ads_cache import seen_ads_cache, seen_key
+from app.services.notification_dispatcher import NotificationDispatcher, PRIORITY_PAID, PRIORITY_DEFAULT
+from app.utils.avito_url import canonicalize_avito_url
 from app.db.repository import (
     get_active_trackings_for_subscribed_users, 
-    filter_new_ads_for_tracking,
-    mark_ads_as_seen
+    filter_new_ads_batch,
+    mark_ads_as_seen_batch,
+    get_recent_seen_ads,
+    delete_seen_ads_older_than
 )
 
 logger = logging.getLogger(__name__)
 
+RETENTION_CHECK_INTERVAL = 60 * 60  # Как часто чистить старые просмотренные объявления, секунды
+TELEGRAM_MESSAGE_LIMIT = 4096  # Максимальная длина текста сообщения
+
+# Кандидат на уведомление: (telegram_id, отслеживание, объявления в его ценовых границах)
+Candidate = Tuple[str, Dict[str, Any], List[Dict[str, Any]]]
+
+# Курсор поиска: (подписчики на момент курсора, курсор парсера, сколько запросов подряд с курсором)
+SearchCursor = Tuple[frozenset, Dict[str, int], int]
+
+
+@dataclass
+class SearchOutcome:
+    """Результат задачи парсинга: кандидаты и курсоры, которые сохраняются только после записи в БД"""
+    candidates: List[Candidate] = field(default_factory=list)
+    cursors: Dict[str, SearchCursor] = field(default_factory=dict)
+
+    def merge(self, other: "SearchOutcome") -> None:
+        self.candidates.extend(other.candidates)
+        self.cursors.update(other.cursors)
+
 class TrackingService:
     """Сервис для отслеживания новых объявлений"""
     
-    def __init__(self, bot: Bot):
+    def __init__(self, bot: Bot, dispatcher: NotificationDispatcher):
         self.bot = bot
+        self.dispatcher = dispatcher
         self.running = False
+        self.interval = TRACKING_INTERVAL
+        self.cycle_deadline = TRACKING_CYCLE_DEADLINE
+        self.batch_size = TRACKING_BATCH_SIZE
+        self.pages = TRACKING_PAGES
+        # Объявления старше срока хранения просмотренных не запрашиваем: их строки в items
+        # уже удалены, и закреплённое старое объявление пришло бы повторно
+        self.max_age = ITEMS_RETENTION_DAYS * 24 * 60 * 60 if ITEMS_RETENTION_DAYS > 0 else None
+        self._semaphore = asyncio.Semaphore(TRACKING_CONCURRENCY)
+        # Поиски, которые ещё обрабатываются (в том числе с прошлых циклов)
+        self._in_flight: Dict[str, asyncio.Task] = {}
+        # Раздача результатов поисков, завершившихся после дедлайна цикла
+        self._late_deliveries: Set[asyncio.Task] = set()
+        # Курсоры парсера по поискам
+        self.use_cursor = TRACKING_USE_CURSOR
+        self.full_scan_every = TRACKING_FULL_SCAN_EVERY
+        self._cursors: Dict[str, SearchCursor] = {}
+        self.seen_cache = seen_ads_cache
+        self._retention_task: Optional[asyncio.Task] = None
+        # Объявления отслеживаний в режиме digest, ожидающие окончания окна DIGEST_WINDOW
+        self._digest_buffer: Dict[str, Dict[str, Any]] = {}
+        self.metrics = {
+            'cycles_total': 0,
+            'deadline_exceeded_total': 0,
+            'last_cycle_duration': 0.0,
+            'last_cycle_searches': 0,
+            'last_cycle_started': 0,
+            'last_cycle_completed': 0,
+            'last_cycle_skipped': 0,
+            'backlog': 0,
+        }
         
     async def start_tracking(self):
         """Запускает периодическое отслеживание объявлений"""
@@ -29,23 +94,62 @@ class TrackingService:
             
         self.running = True
         logger.info("🚀 Запуск сервиса отслеживания объявлений")
+        await self.warm_seen_cache()
+        if ITEMS_RETENTION_DAYS > 0:
+            self._retention_task = asyncio.create_task(self.retention_loop())
         
+        loop = asyncio.get_running_loop()
         while self.running:
+            cycle_started_at = loop.time()
             try:
                 await self.check_new_ads()
-                await asyncio.sleep(60)  # Ждем 1 минуту
             except Exception as e:
                 logger.error(f"Ошибка в цикле отслеживания: {e}")
-                await asyncio.sleep(60)  # Ждем минуту перед следующей попыткой
+            # Интервал отсчитываем от начала цикла, а не от его конца
+            elapsed = loop.time() - cycle_started_at
+            await asyncio.sleep(max(0.0, self.interval - elapsed))
                 
     async def stop_tracking(self):
         """Останавливает отслеживание"""
         logger.info("🛑 Остановка сервиса отслеживания объявлений")
         self.running = False
+        for task in [*self._in_flight.values(), *self._late_deliveries]:
+            task.cancel()
+        if self._retention_task:
+            self._retention_task.cancel()
+        # Накопленные сводки отправляем сразу, чтобы не потерять
+        for tracking_id in list(self._digest_buffer):
+            self._flush_digest(tracking_id)
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Возвращает метрики циклов отслеживания"""
+        return {
+            **self.metrics,
+            'backlog': len(self._in_flight),
+            'seen_cache': self.seen_cache.stats(),
+            'notifications': self.dispatcher.get_metrics(),
+        }
+
+    async def warm_seen_cache(self):
+        """Прогревает кэш просмотренных объявлений из таблицы items"""
+        since = datetime.utcnow() - timedelta(seconds=self.seen_cache.ttl)
+        keys = await get_recent_seen_ads(since, self.seen_cache.max_entries)
+        self.seen_cache.warm(keys)
         
+    async def retention_loop(self):
+        """Периодически удаляет просмотренные объявления старше ITEMS_RETENTION_DAYS"""
+        while self.running:
+            try:
+                await delete_seen_ads_older_than(datetime.utcnow() - timedelta(days=ITEMS_RETENTION_DAYS))
+            except Exception as e:
+                logger.error(f"Ошибка очистки просмотренных объявлений: {e}")
+            await asyncio.sleep(RETENTION_CHECK_INTERVAL)
+
     async def check_new_ads(self):
         """Проверяет новые объявления и отправляет уведомления"""
         logger.info("🔍 Проверка новых объявлений...")
+        loop = asyncio.get_running_loop()
+        cycle_started_at = loop.time()
         
         try:
             # Получаем отслеживания пользователей с активной подпиской
@@ -55,107 +159,415 @@ class TrackingService:
                 logger.info("Нет активных отслеживаний для пользователей с подпиской")
                 return
                 
-            # Обрабатываем каждый фильтр отдельно
-            for telegram_id, trackings in users_trackings.items():
-                for tracking in trackings:
-                    await self.process_tracking(tracking, telegram_id)
+            # Склеиваем одинаковые поиски: каждый уникальный URL запрашиваем один раз
+            searches = self.group_trackings_by_search(users_trackings)
+            total_trackings = sum(len(subscribers) for subscribers in searches.values())
+            logger.info(f"Уникальных поисков: {len(searches)} на {total_trackings} отслеживаний")
+
+            # Курсоры удалённых поисков больше не нужны
+            self._cursors = {url: value for url, value in self._cursors.items() if url in searches}
+
+            # Поиск с прошлого цикла ещё не закончился - не запускаем его повторно
+            pending_searches = [
+                (search_url, subscribers) for search_url, subscribers in searches.items()
+                if search_url not in self._in_flight
+            ]
+            skipped = len(searches) - len(pending_searches)
+
+            if self.batch_size > 0:
+                # Пакетами: один HTTP-запрос к парсеру на batch_size поисков
+                groups = [
+                    pending_searches[start:start + self.batch_size]
+                    for start in range(0, len(pending_searches), self.batch_size)
+                ]
+                tasks = [self._start_task(self._run_batch(group), [url for url, _ in group]) for group in groups]
+            else:
+                tasks = [
+                    self._start_task(self._run_search(search_url, subscribers), [search_url])
+                    for search_url, subscribers in pending_searches
+                ]
+
+            completed = 0
+            pending = set(tasks)
+            deadline = loop.time() + self.cycle_deadline
+            # Результаты раздаём по мере готовности задач, не дожидаясь самой медленной;
+            # задачи, завершившиеся одновременно, проверяются в БД одним запросом.
+            # Пакетные задачи раздают свои поиски сами и возвращают пустой результат
+            while pending:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                completed += len(done)
+                outcome = SearchOutcome()
+                for task in done:
+                    if not task.cancelled() and not task.exception():
+                        outcome.merge(task.result())
+                await self.deliver_new_ads(outcome)
+
+            if pending:
+                # Не дожидаемся зависших поисков дольше дедлайна: они доработают в фоне,
+                # а следующий цикл их пропустит
+                self.metrics['deadline_exceeded_total'] += 1
+                logger.warning(f"Дедлайн цикла ({self.cycle_deadline}с) истёк, в работе осталось {len(pending)} задач")
+                # Опоздавшие поиски раздают результаты сами, когда доработают
+                for task in pending:
+                    task.add_done_callback(self._deliver_late)
+
+            duration = loop.time() - cycle_started_at
+            self.metrics.update({
+                'cycles_total': self.metrics['cycles_total'] + 1,
+                'last_cycle_duration': round(duration, 3),
+                'last_cycle_searches': len(searches),
+                'last_cycle_started': len(pending_searches),
+                'last_cycle_completed': completed,
+                'last_cycle_skipped': skipped,
+                'backlog': len(self._in_flight),
+            })
+            logger.info(
+                f"Цикл завершён за {duration:.1f}с: запущено {len(pending_searches)} поисков в {len(tasks)} задачах, "
+                f"завершено задач {completed}, "
+                f"пропущено {skipped}, в работе {len(self._in_flight)}"
+            )
                 
         except Exception as e:
             logger.error(f"Ошибка при проверке новых объявлений: {e}")
             import traceback
             traceback.print_exc()
-            
-    async def process_tracking(self, tracking: Dict[str, Any], telegram_id: str):
-        """Обрабатывает один фильтр отслеживания"""
+
+    def _start_task(self, coro, search_urls: List[str]) -> asyncio.Task:
+        """Запускает задачу и помечает её поиски как выполняющиеся"""
+        task = asyncio.create_task(coro)
+        for search_url in search_urls:
+            self._in_flight[search_url] = task
+
+        def release(_task):
+            for search_url in search_urls:
+                self._release(search_url, _task)
+
+        task.add_done_callback(release)
+        return task
+
+    def _release(self, search_url: str, task: asyncio.Task):
+        """Снимает отметку о выполнении поиска, если её поставила эта задача, а не задача следующего цикла"""
+        if self._in_flight.get(search_url) is task:
+            del self._in_flight[search_url]
+
+    async def _run_batch(self, group: List[Tuple[str, List[Tuple[str, Dict[str, Any]]]]]) -> SearchOutcome:
+        """
+        Парсит пакет поисков одним запросом к /parse/batch
+
+        Парсер присылает результаты по мере готовности, и каждый раздаётся сразу:
+        медленный поиск не задерживает уведомления остальных, а готовый поиск
+        освобождается для следующего цикла, не дожидаясь конца пакета.
+        Поэтому возвращаемый результат пустой.
+        """
+        task = asyncio.current_task()
+        async with self._semaphore:
+            # Цены не передаём: у каждого отслеживания свои границы, фильтруем локально
+            searches = []
+            cursor_uses = []
+            for index, (search_url, subscribers) in enumerate(group):
+                search = {'id': str(index), 'url': search_url}
+                cursor, uses = self._cursor_for(search_url, subscribers)
+                if cursor:
+                    search['cursor'] = cursor
+                if self.pages > 1:
+                    search['pages'] = self.pages
+                if self.max_age:
+                    search['max_age'] = self.max_age
+                searches.append(search)
+                cursor_uses.append(uses)
+            try:
+                async for result in parser_client.parse_batch(searches):
+                    index = int(result['id'])
+                    search_url, subscribers = group[index]
+                    if result.get('success'):
+                        outcome = SearchOutcome()
+                        self._add_cursor(outcome, search_url, subscribers, result.get('cursor'), cursor_uses[index])
+                        outcome.candidates = self.distribute_ads(search_url, subscribers, result.get('ads', []))
+                        await self.deliver_new_ads(outcome)
+                    else:
+                        logger.warning(f"Неуспешный результат парсинга для поиска {search_url[:50]}...: {result.get('message')}")
+                    self._release(search_url, task)
+            except Exception as e:
+                logger.error(f"Ошибка при пакетном парсинге {len(group)} поисков: {e}")
+            return SearchOutcome()
+
+    async def _run_search(self, search_url: str, subscribers: List[Tuple[str, Dict[str, Any]]]) -> SearchOutcome:
+        """Обрабатывает поиск с ограничением числа одновременных запросов к парсеру"""
+        async with self._semaphore:
+            return await self.process_search(search_url, subscribers)
+
+    @staticmethod
+    def _subscribers_signature(subscribers: List[Tuple[str, Dict[str, Any]]]) -> frozenset:
+        return frozenset(
+            (str(tracking['id']), tracking.get('min_price'), tracking.get('max_price'))
+            for _, tracking in subscribers
+        )
+
+    def _cursor_for(self, search_url: str, subscribers: List[Tuple[str, Dict[str, Any]]]) -> Tuple[Optional[Dict[str, int]], int]:
+        """
+        Курсор поиска для запроса к парсеру и номер запроса с курсором подряд
+
+        Курсор годится, только если с его получения не появилось новых отслеживаний
+        и не менялись ценовые границы: иначе им нужна вся первая страница.
+        Каждый full_scan_every-й запрос идёт без курсора: курсор не видит смену цены
+        без поднятия объявления, а полная страница и ключ (ad_id, price) её находят.
+        """
+        if not self.use_cursor:
+            return None, 0
+        saved = self._cursors.get(search_url)
+        if not saved or not self._subscribers_signature(subscribers) <= saved[0]:
+            return None, 0
+        _, cursor, uses = saved
+        if self.full_scan_every and uses >= self.full_scan_every:
+            return None, 0
+        return cursor, uses + 1
+
+    def _add_cursor(self, outcome: SearchOutcome, search_url: str, subscribers: List[Tuple[str, Dict[str, Any]]],
+                    cursor: Optional[Dict[str, int]], uses: int):
+        if self.use_cursor and cursor:
+            outcome.cursors[search_url] = (self._subscribers_signature(subscribers), cursor, uses)
+
+    def _deliver_late(self, task: asyncio.Task):
+        """Раздаёт результаты поиска, завершившегося после дедлайна цикла"""
+        if task.cancelled() or task.exception() or not self.running:
+            return
+        # Цикл событий держит задачи только по слабой ссылке - храним их до завершения
+        delivery = asyncio.create_task(self.deliver_new_ads(task.result()))
+        self._late_deliveries.add(delivery)
+        delivery.add_done_callback(self._late_delivery_done)
+
+    def _late_delivery_done(self, delivery: asyncio.Task):
+        self._late_deliveries.discard(delivery)
+        if not delivery.cancelled() and delivery.exception():
+            logger.error(f"Ошибка при раздаче результатов после дедлайна: {delivery.exception()}")
+
+    @staticmethod
+    def group_trackings_by_search(users_trackings: Dict[str, List[Dict[str, Any]]]) -> Dict[str, List[Tuple[str, Dict[str, Any]]]]:
+        """Группирует отслеживания по канонической ссылке поиска"""
+        searches: Dict[str, List[Tuple[str, Dict[str, Any]]]] = {}
+        for telegram_id, trackings in users_trackings.items():
+            for tracking in trackings:
+                search_url = canonicalize_avito_url(tracking['link'])
+                searches.setdefault(search_url, []).append((telegram_id, tracking))
+        return searches
+
+    async def process_search(self, search_url: str, subscribers: List[Tuple[str, Dict[str, Any]]]) -> SearchOutcome:
+        """Один раз парсит поиск и раскладывает результат по отслеживаниям с этой ссылкой"""
+        outcome = SearchOutcome()
         try:
-            tracking_id = tracking['id']
-            tracking_name = tracking['name']
-            link = tracking['link']
-            min_price = tracking.get('min_price')  # Может быть None
-            max_price = tracking.get('max_price')  # Может быть None
-            
-            logger.info(f"Парсинг фильтра {tracking_id} для пользователя {telegram_id}")
-            logger.info(f"URL: {link[:50]}... (цена: {min_price}-{max_price})")
-            
-            # Отправляем запрос на парсинг для этого фильтра
+            logger.info(f"Парсинг поиска для {len(subscribers)} отслеживаний")
+            logger.info(f"URL: {search_url[:50]}...")
+
+            # Цены не передаём: у каждого отслеживания свои границы, фильтруем локально
+            cursor, uses = self._cursor_for(search_url, subscribers)
             result = await parser_client.parse_ads(
-                urls=[link],
-                min_price=min_price,
-                max_price=max_price
+                urls=[search_url], cursor=cursor, pages=self.pages, max_age=self.max_age
             )
-            
+
             if not result or not result.get('success'):
-                logger.warning(f"Неуспешный результат парсинга для фильтра {tracking_id}")
-                return
-                
+                logger.warning(f"Неуспешный результат парсинга для поиска {search_url[:50]}...")
+                return outcome
+            self._add_cursor(outcome, search_url, subscribers, result.get('cursor'), uses)
+
             ads = result.get('ads', [])
-            if not ads:
-                logger.info(f"Новых объявлений не найдено для фильтра {tracking_id}")
-                return
-            
+
             # Логируем первые несколько объявлений для отладки
             logger.debug(f"Получено {len(ads)} объявлений, первое: {ads[0] if ads else 'нет'}")
+
+        except Exception as e:
+            logger.error(f"Ошибка при парсинге поиска {search_url[:50]}...: {e}")
+            import traceback
+            traceback.print_exc()
+            return outcome
+
+        outcome.candidates = self.distribute_ads(search_url, subscribers, ads)
+        return outcome
+
+    def distribute_ads(self, search_url: str, subscribers: List[Tuple[str, Dict[str, Any]]],
+                       ads: List[Dict[str, Any]]) -> List[Candidate]:
+        """Раскладывает объявления поиска по отслеживаниям с учётом их ценовых границ"""
+        if not ads:
+            logger.info(f"Объявлений не найдено для поиска {search_url[:50]}...")
+            return []
+
+        candidates = []
+        for telegram_id, tracking in subscribers:
+            tracking_ads = self.filter_ads_by_price(ads, tracking.get('min_price'), tracking.get('max_price'))
+            if tracking_ads:
+                candidates.append((telegram_id, tracking, tracking_ads))
+            else:
+                logger.info(f"Объявлений в границах цены не найдено для фильтра {tracking['id']}")
+        return candidates
+
+    @staticmethod
+    def filter_ads_by_price(ads: List[Dict[str, Any]], min_price: Optional[int], max_price: Optional[int]) -> List[Dict[str, Any]]:
+        """Применяет ценовые границы отслеживания (как это делал парсер для одного запроса)"""
+        return [
+            ad for ad in ads
+            if (not min_price or ad['price'] >= min_price)
+            and (not max_price or ad['price'] <= max_price)
+        ]
             
-            # Фильтруем только новые объявления (проверяем в БД)
-            new_ads = await filter_new_ads_for_tracking(str(tracking_id), ads)
-            
-            if not new_ads:
-                logger.info(f"Все объявления уже были показаны для фильтра {tracking_id}")
-                return
-                
-            logger.info(f"Найдено {len(new_ads)} новых объявлений для фильтра {tracking_id}")
-            
-            # Отправляем уведомления пользователю
-            for ad in new_ads:
-                await self.send_ad_notification(telegram_id, ad, tracking_name)
-            
-            # Помечаем объявления как просмотренные для этого фильтра
+    async def deliver_new_ads(self, outcome: SearchOutcome):
+        """
+        Раздаёт результаты поисков и только потом сдвигает их курсоры
+
+        Если проверка или запись в БД не удалась, курсоры остаются прежними,
+        и следующий цикл снова получит те же объявления.
+        """
+        if await self.store_and_notify(outcome.candidates):
+            self._cursors.update(outcome.cursors)
+
+    async def store_and_notify(self, candidates: List[Candidate]) -> bool:
+        """Отбирает новые объявления всех отслеживаний одним запросом, уведомляет и сохраняет их одной вставкой"""
+        if not candidates:
+            return True
+        try:
+            ads_by_tracking: Dict[str, List[Dict[str, Any]]] = {}
+            for _, tracking, ads in candidates:
+                ads_by_tracking.setdefault(str(tracking['id']), []).extend(ads)
+
+            # Известные по кэшу объявления отбрасываем сразу, в БД проверяем только остальные
+            unknown_by_tracking = self.seen_cache.split(ads_by_tracking)
+            new_by_tracking = await filter_new_ads_batch(unknown_by_tracking) if unknown_by_tracking else {}
+            if new_by_tracking is None:
+                return False  # Ошибка БД уже залогирована; ничего не отправляем, чтобы не было дубликатов
+            # Нашедшиеся в БД объявления запоминаем, чтобы не спрашивать о них в следующем цикле
+            new_keys = {seen_key(tracked_id, ad) for tracked_id, ads in new_by_tracking.items() for ad in ads}
+            self.seen_cache.add_ads({
+                tracked_id: [ad for ad in ads if seen_key(tracked_id, ad) not in new_keys]
+                for tracked_id, ads in unknown_by_tracking.items()
+            })
+            if not new_by_tracking:
+                logger.info(f"Все объявления уже были показаны ({len(ads_by_tracking)} фильтров)")
+                return True
+
+            for telegram_id, tracking, _ in candidates:
+                new_ads = new_by_tracking.get(str(tracking['id']))
+                if not new_ads:
+                    continue
+                logger.info(f"Найдено {len(new_ads)} новых объявлений для фильтра {tracking['id']}")
+                # Отправляем уведомления пользователю
+                self.deliver_tracking_ads(telegram_id, tracking, new_ads)
+
+            # Помечаем объявления как просмотренные для всех фильтров разом
             try:
-                await mark_ads_as_seen(str(tracking_id), new_ads)
+                await mark_ads_as_seen_batch(new_by_tracking)
+                self.seen_cache.add_ads(new_by_tracking)
             except Exception as save_error:
                 logger.error(f"Ошибка при сохранении объявлений в БД: {save_error}")
                 import traceback
                 traceback.print_exc()
                 # Продолжаем работу, не прерывая весь процесс
-                
+                return False
+            return True
+
         except Exception as e:
-            logger.error(f"Ошибка при обработке фильтра {tracking.get('id', 'unknown')}: {e}")
+            logger.error(f"Ошибка при раздаче новых объявлений: {e}")
             import traceback
             traceback.print_exc()
-            
-    async def send_ad_notification(self, telegram_id: str, ad: Dict[str, Any], tracking_name: str = None):
-        """Отправляет уведомление о конкретном объявлении"""
-        try:
-            ad_id = ad['id']
-            price = ad['price']
-            
-            # Формируем сообщение
-            message = (
-                "🔔 <b>Найдено новое объявление</b>\n\n"
-                f"💰 Цена: <b>{price:,} ₽</b>\n"
-                f"🔗 Ссылка: https://www.avito.ru/{ad_id}\n"
-            )
-            
-            if tracking_name:
-                message += f"📂 Отслеживание: <i>{tracking_name}</i>\n"
-                
-            await self.bot.send_message(
-                chat_id=telegram_id,
-                text=message,
+            return False
+
+    def deliver_tracking_ads(self, telegram_id: str, tracking: Dict[str, Any], new_ads: List[Dict[str, Any]]):
+        """Отправляет новые объявления отслеживания по одному или сводкой - по его режиму доставки"""
+        priority = PRIORITY_PAID if tracking.get('is_paid') else PRIORITY_DEFAULT
+        mode = tracking.get('delivery_mode') or DELIVERY_AUTO
+
+        if mode == DELIVERY_DIGEST and DIGEST_WINDOW > 0:
+            self._buffer_digest(telegram_id, tracking, new_ads, priority)
+        elif mode == DELIVERY_DIGEST or (mode == DELIVERY_AUTO and len(new_ads) > DIGEST_THRESHOLD):
+            self.send_digest(telegram_id, new_ads, tracking['name'], priority)
+        else:
+            for ad in new_ads:
+                self.send_ad_notification(telegram_id, ad, tracking['name'], priority)
+
+    def _buffer_digest(self, telegram_id: str, tracking: Dict[str, Any], new_ads: List[Dict[str, Any]], priority: int):
+        """Копит объявления до конца окна DIGEST_WINDOW, отсчитываемого от первого объявления"""
+        tracking_id = str(tracking['id'])
+        entry = self._digest_buffer.get(tracking_id)
+        if entry is None:
+            entry = self._digest_buffer[tracking_id] = {
+                'telegram_id': telegram_id,
+                'name': tracking['name'],
+                'priority': priority,
+                'ads': [],
+            }
+            asyncio.get_running_loop().call_later(DIGEST_WINDOW, self._flush_digest, tracking_id)
+        entry['ads'].extend(new_ads)
+
+    def _flush_digest(self, tracking_id: str):
+        entry = self._digest_buffer.pop(tracking_id, None)
+        if entry and entry['ads']:
+            self.send_digest(entry['telegram_id'], entry['ads'], entry['name'], entry['priority'])
+
+    @staticmethod
+    def build_digest_messages(ads: List[Dict[str, Any]], tracking_name: str = None) -> List[str]:
+        """Сводка новых объявлений; если не влезает в одно сообщение Telegram - делится на несколько"""
+        header = f"🔔 <b>Новых объявлений: {len(ads)}</b>\n"
+        if tracking_name:
+            header += f"📂 Отслеживание: <i>{tracking_name}</i>\n"
+        header += "\n"
+
+        messages = []
+        current = header
+        for ad in ads:
+            line = f"💰 <b>{ad['price']:,} ₽</b> - https://www.avito.ru/{ad['id']}\n"
+            if len(current) + len(line) > TELEGRAM_MESSAGE_LIMIT:
+                messages.append(current)
+                current = ""
+            current += line
+        messages.append(current)
+        return messages
+
+    def send_digest(self, telegram_id: str, ads: List[Dict[str, Any]], tracking_name: str = None,
+                    priority: int = PRIORITY_DEFAULT):
+        """Ставит в очередь сводку новых объявлений вместо отдельных сообщений"""
+        for message in self.build_digest_messages(ads, tracking_name):
+            self.dispatcher.enqueue(
+                telegram_id,
+                message,
+                priority=priority,
                 parse_mode="HTML",
-                disable_web_page_preview=False
+                disable_web_page_preview=True
             )
-            
-            logger.info(f"Отправлено уведомление пользователю {telegram_id} об объявлении {ad_id}")
-            
-        except Exception as e:
-            logger.error(f"Ошибка при отправке уведомления пользователю {telegram_id} об объявлении {ad.get('id')}: {e}")
+        logger.info(f"Сводка из {len(ads)} объявлений для пользователя {telegram_id} поставлена в очередь")
+
+    def send_ad_notification(self, telegram_id: str, ad: Dict[str, Any], tracking_name: str = None,
+                             priority: int = PRIORITY_DEFAULT):
+        """Ставит уведомление о конкретном объявлении в очередь отправки"""
+        ad_id = ad['id']
+        price = ad['price']
+
+        # Формируем сообщение
+        message = (
+            "🔔 <b>Найдено новое объявление</b>\n\n"
+            f"💰 Цена: <b>{price:,} ₽</b>\n"
+            f"🔗 Ссылка: https://www.avito.ru/{ad_id}\n"
+        )
+
+        if tracking_name:
+            message += f"📂 Отслеживание: <i>{tracking_name}</i>\n"
+
+        self.dispatcher.enqueue(
+            telegram_id,
+            message,
+            priority=priority,
+            parse_mode="HTML",
+            disable_web_page_preview=False
+        )
+        logger.info(f"Уведомление пользователю {telegram_id} об объявлении {ad_id} поставлено в очередь")
 
 # Глобальная переменная для сервиса отслеживания
 tracking_service = None
 
-def init_tracking_service(bot: Bot):
+def init_tracking_service(bot: Bot, dispatcher: NotificationDispatcher):
     """Инициализирует глобальный сервис отслеживания"""
     global tracking_service
-    tracking_service = TrackingService(bot)
+    tracking_service = TrackingService(bot, dispatcher)
+    return tracking_service
+
+def get_tracking_service() -> Optional[TrackingService]:
     return tracking_service
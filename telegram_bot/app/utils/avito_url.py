@@ -0,0 +1,36 @@
+"""
+Нормализация ссылок поиска Avito
+"""
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+# Параметры, которые не влияют на выдачу и только мешают склейке одинаковых поисков
+TRACKING_PARAMS = {"context", "from", "f_source", "referrer", "sessid", "lc", "ntk"}
+TRACKING_PREFIXES = ("utm_",)
+
+AVITO_HOSTS = {"avito.ru", "www.avito.ru", "m.avito.ru"}
+
+
+def canonicalize_avito_url(url: str) -> str:
+    """
+    Приводит ссылку поиска Avito к каноническому виду.
+
+    Одинаковые по смыслу поиски (разный порядок параметров, utm-метки,
+    мобильный домен, хвостовой слэш) дают одну и ту же строку, поэтому
+    её можно использовать как ключ для однократного запроса к парсеру.
+    """
+    parts = urlsplit(url.strip())
+
+    host = parts.netloc.lower()
+    if host in AVITO_HOSTS:
+        host = "www.avito.ru"
+
+    path = parts.path.rstrip("/") or "/"
+
+    params = [
+        (key, value)
+        for key, value in parse_qsl(parts.query, keep_blank_values=False)
+        if key not in TRACKING_PARAMS and not key.startswith(TRACKING_PREFIXES)
+    ]
+    params.sort()
+
+    return urlunsplit(("https", host, path, urlencode(params, doseq=True), ""))